@@ -1,3 +1,8 @@
+import collections
+import time
+
+import numpy as np
+
 from mdp_testbed.internal import Maze, State, Action, MDPModel
 from mdp_testbed.utils import prod
 
@@ -41,9 +46,90 @@ class Environment(object):
                                                                  action,
                                                                  to_state)
 
+    def get_successors(self, state: State, action: Action) -> list:
+        """
+        :return: a list of ``(state, probability)`` pairs of all the states
+            that can be reached from the given state using the given action
+            with a non-zero probability
+        """
+        return self._transition_model.get_successors(state, action)
+
+    def get_all_successors(self) -> dict:
+        """
+        :return: a dictionary mapping each state in MDP to a dictionary which
+            maps each action to the list of successors of the state as
+            returned by :meth:`get_successors`
+        """
+        return self._transition_model.get_all_successors()
+
+    def get_state_index(self, state: State) -> int:
+        """
+        :return: the index of the given state, i.e. its position in the list
+            returned by :meth:`get_all_states`; this is also the index of the
+            state in the arrays returned by :meth:`get_reward_vector`,
+            :meth:`get_teleport_mask` and :meth:`get_transition_matrices`
+        """
+        return self._transition_model.get_state_index(state)
+
+    def get_reward_vector(self) -> np.ndarray:
+        """
+        :return: a (read-only) numpy array of rewards of all states in MDP,
+            in the order of :meth:`get_all_states`
+        """
+        return self._transition_model.get_reward_vector()
+
+    def get_teleport_mask(self) -> np.ndarray:
+        """
+        :return: a (read-only) boolean numpy array which is ``True`` for the
+            teleport states, in the order of :meth:`get_all_states`
+        """
+        return self._transition_model.get_teleport_mask()
+
+    def get_transition_matrices(self, expand_teleports: bool=False) -> dict:
+        """
+        The transition matrix ``T`` of an action is a square matrix over all
+        states in MDP (in the order of :meth:`get_all_states`) such that
+        ``T[i, j]`` is the probability of a transition from the ``i``-th to
+        the ``j``-th state. It is given in the CSR (compressed sparse row)
+        layout, i.e. as a tuple ``(data, indices, indptr)`` of numpy arrays
+        where the non-zero probabilities of the ``i``-th row are
+        ``data[indptr[i]:indptr[i + 1]]`` and their column indices are
+        ``indices[indptr[i]:indptr[i + 1]]``. The tuple can be passed directly
+        to ``scipy.sparse.csr_matrix`` (together with the shape of the
+        matrix).
+
+        A teleport state moves to any of the states but the dummy one (the
+        last) with the same probability, whatever the action. These rows
+        would be dense, so they are left empty by default and the teleport
+        states are given by :meth:`get_teleport_mask` instead, e.g. the
+        expected next values of all states are::
+
+            q = csr_matrix((data, indices, indptr), shape=(n, n)).dot(v)
+            q[environment.get_teleport_mask()] = v[:-1].mean()
+
+        :param expand_teleports: whether to fill in the rows of the teleport
+            states, which takes memory proportional to the number of
+            teleports times the number of states
+        :return: a dictionary mapping each action to its transition matrix
+        """
+        return {a: self._transition_model.get_transition_matrix(
+                    a, expand_teleports)
+                for a in Action}
+
+
+Progress = collections.namedtuple('Progress', ['iteration', 'residual',
+                                               'policy_changes', 'elapsed'])
+Progress.__doc__ = """Progress of a solve after an iteration, as reported by
+:meth:`SolverBase.report_progress`. The ``residual`` and ``policy_changes``
+are ``None`` if the solver does not report them, ``elapsed`` is the time in
+seconds since the progress callback was set."""
+
 
 # noinspection PyAttributeOutsideInit
 class SolverBase(object):
+    progress_callback = None
+    initial_values = None
+
     def __init__(self, gamma: float=.99, p_correct: float=.8):
         if gamma > 1 or gamma < 0:
             raise ValueError('Gamma must be from the range [0, 1].')
@@ -53,6 +139,45 @@ class SolverBase(object):
         self.gamma = gamma
         self.p_correct = p_correct
 
+    def set_progress_callback(self, callback):
+        """
+        :param callback: a function which is called with a
+            :class:`Progress` every time the solver reports its progress, or
+            ``None`` to stop the reporting; the testbed sets it right before
+            calling :meth:`solve_mdp`
+        """
+        self.progress_callback = callback
+        self._progress_start_time = time.time()
+
+    def set_initial_values(self, values: np.ndarray):
+        """Warm start: the testbed may call it right before calling
+        :meth:`solve_mdp` with the values of a previous solve of the same
+        maze (with different parameters). The solver may start from them
+        instead of from zeros, but it does not have to.
+
+        :param values: the values of all states in the order of
+            :meth:`Environment.get_all_states` (i.e. indexed by
+            :attr:`State.index`) or ``None`` for no warm start
+        """
+        self.initial_values = values
+
+    def report_progress(self, iteration: int, residual: float=None,
+                        policy_changes: int=None):
+        """Reports the progress of the solve to the testbed. Solvers should
+        call it after each iteration. It does nothing if no one listens, so
+        it can be called even in tight loops.
+
+        :param iteration: number of the iteration just finished (from 1)
+        :param residual: the maximum change of a value in the iteration
+        :param policy_changes: number of states whose action changed in the
+            iteration
+        """
+        if self.progress_callback is None:
+            return
+        self.progress_callback(Progress(
+            iteration, residual, policy_changes,
+            time.time() - self._progress_start_time))
+
     def solve_mdp(self, environment: Environment):
         raise NotImplementedError()
 
@@ -61,3 +186,24 @@ class SolverBase(object):
 
     def get_value_for_state(self, state: State) -> float:
         raise NotImplementedError()
+
+    def get_values(self) -> np.ndarray:
+        """Optional bulk counterpart of :meth:`get_value_for_state`, the
+        testbed falls back to asking for each state separately if it raises
+        :class:`NotImplementedError`.
+
+        :return: the values of all states in the order of
+            :meth:`Environment.get_all_states` (i.e. indexed by
+            :attr:`State.index`)
+        """
+        raise NotImplementedError()
+
+    def get_policy(self) -> np.ndarray:
+        """Optional bulk counterpart of :meth:`get_action_for_state`, the
+        testbed falls back to asking for each state separately if it raises
+        :class:`NotImplementedError`.
+
+        :return: the values of the actions (see :class:`Action`) of all
+            states in the order of :meth:`Environment.get_all_states`
+        """
+        raise NotImplementedError()
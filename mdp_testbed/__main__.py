@@ -1,6 +1,9 @@
 import argparse
 
-import mdp_testbed.ui as ui
+import mdp_testbed.batch as batch
+import mdp_testbed.bench as bench
+import mdp_testbed.generator as generator
+import mdp_testbed.solvers as solvers
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser(description='MDP Testbed')
@@ -14,19 +17,54 @@ if __name__ == '__main__':
                           'and will immediately load the  solution given in '
                           'the filename. Otherwise no solution will be loaded '
                           '(and can be loaded using the GUI).')
+    grp.add_argument('-b', '--builtin', action='store', required=False,
+                     nargs=1, metavar='solver', default=None,
+                     choices=sorted(solvers.BUILTIN_SOLVERS),
+                     help='If specified, the solution viewer will be launched '
+                          'and will immediately load the given built-in '
+                          'solver (one of: {}).'.format(
+                              ', '.join(sorted(solvers.BUILTIN_SOLVERS))))
     ap.add_argument('-m', '--maze', action='store', required=False, nargs=1,
                     metavar='filename', default=None,
                     help='If specified, the solution viewer or the editor '
                          'will be started with the specified maze already '
                          'loaded. Otherwise no maze will be loaded (and can '
                          'be loaded using the GUI).')
+    sub = ap.add_subparsers(dest='command', metavar='command',
+                            help='If specified, the given command is run '
+                                 'instead of launching the GUI.')
+    batch.add_arguments(sub.add_parser(
+        'run', description='Runs solutions on mazes without the GUI.',
+        help='run solutions on mazes without the GUI (see "run -h")'))
+    bench.add_arguments(sub.add_parser(
+        'bench', description='Benchmarks the testbed on the bundled and '
+                             'synthetic mazes.',
+        help='benchmark the testbed (see "bench -h")'))
+    generator.add_arguments(sub.add_parser(
+        'generate', description='Generates a random maze of any size.',
+        help='generate a random maze (see "generate -h")'))
     ns = ap.parse_args()
+    if ns.command == 'run':
+        batch.main(ns)
+        ap.exit()
+    elif ns.command == 'bench':
+        bench.main(ns)
+        ap.exit()
+    elif ns.command == 'generate':
+        generator.main(ns)
+        ap.exit()
+
+    # the GUI is imported only when needed so that the commands can run on
+    # machines without tkinter or a display
+    import mdp_testbed.ui as ui
     if ns.editor:
         top, gui = ui.ResourceMazeEditor.create_editor()
     else:
         top, gui = ui.SolutionViewer.create_viewer()
         if ns.solution is not None:
             gui.after(1, gui.load_solution, ns.solution[0])
+        elif ns.builtin is not None:
+            gui.after(1, gui.load_builtin_solver, ns.builtin[0])
     if ns.maze is not None:
         gui.load_maze(ns.maze[0])
     # noinspection PyUnresolvedReferences
@@ -0,0 +1,754 @@
+"""Headless running of solvers on mazes.
+
+This module runs solvers (solution files or built-in solvers) on a set of
+mazes for all combinations of the given parameters, without any GUI, and
+writes the results to CSV and/or JSON files. The runs are independent jobs
+which can be spread over worker processes, each job with a time limit and
+each worker with a memory limit. A solution crashing its worker process
+fails only its own job. It is used by the ``run`` command of the testbed::
+
+    $ python3 -m mdp_testbed run -s solution.py -m mazes/*.zip -g .9 .99 -j 8
+"""
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+import traceback
+from importlib.machinery import SourceFileLoader
+
+import numpy as np
+
+import mdp_testbed.cache as cache
+import mdp_testbed.profiling as profiling
+import mdp_testbed.reference as reference
+import mdp_testbed.solvers as solvers
+from mdp_testbed import Environment
+from mdp_testbed.internal import Action, Maze
+
+# noinspection PyBroadException
+try:
+    import resource
+except:
+    resource = None
+
+CSV_FIELDS = ['solver', 'maze', 'gamma', 'p_correct', 'status', 'runtime',
+              'iterations', 'min_value', 'max_value', 'error']
+
+PROGRESS_INTERVAL = .1
+"""Minimum time in seconds between two progress messages of a solve in the
+solution viewer (see :class:`ThrottledProgress`)."""
+
+KILL_GRACE_PERIOD = 5.0
+"""Time in seconds a worker process gets after the time limit of its job to
+record the timeout itself (see :func:`run_job`), it is killed after that."""
+
+REFERENCE_FIELDS = ['max_error', 'mean_error', 'policy_disagreements',
+                    'matches_reference']
+"""Fields added to the results compared with reference solutions (see
+:func:`compare_result`)."""
+
+
+def is_builtin_solver(solver: str) -> bool:
+    return solver in solvers.BUILTIN_SOLVERS and not os.path.exists(solver)
+
+
+def load_solution_module(filename: str):
+    # every solution file gets its own module so that loading another one
+    # does not replace it
+    name = 'solution_{}'.format(abs(hash(os.path.abspath(filename))))
+    # noinspection PyArgumentList
+    return SourceFileLoader(name, filename).load_module()
+
+
+def load_solver_class(solver: str):
+    """Loads the ``Solver`` class from the given solution file.
+
+    :param solver: path to a solution file or a name of a built-in solver
+        (see :data:`mdp_testbed.solvers.BUILTIN_SOLVERS`)
+    """
+    if is_builtin_solver(solver):
+        return solvers.BUILTIN_SOLVERS[solver]
+    return load_solution_module(solver).Solver
+
+
+# noinspection PyProtectedMember
+def extract_solution(solver, environment: Environment, maze: Maze) -> tuple:
+    """
+    Uses the bulk :meth:`mdp_testbed.SolverBase.get_values` and
+    :meth:`mdp_testbed.SolverBase.get_policy` if the solver provides them,
+    otherwise asks for the value and the action of each state separately.
+
+    :return: the values (as floats) and the actions (as :class:`Action`
+        values in 8-bit integers) of all states of the solved MDP as
+        (height x width) grids
+    """
+    width = maze.get_width()
+    height = maze.get_height()
+    try:
+        values = np.asarray(solver.get_values(), dtype='d')
+        actions = np.asarray(solver.get_policy(), dtype='b')
+    except NotImplementedError:
+        values = np.zeros((height, width))
+        actions = np.zeros((height, width), dtype='b')
+        for s in environment.get_all_states():
+            if s._is_dummy():
+                continue
+            x, y = s._get_coords()
+            values[y, x] = solver.get_value_for_state(s)
+            actions[y, x] = solver.get_action_for_state(s).value
+        return values, actions
+
+    n = len(environment.get_all_states())
+    if values.shape != (n,) or actions.shape != (n,):
+        raise ValueError('get_values and get_policy must return arrays with '
+                         'one item for each of the {} states.'.format(n))
+    # the states are ordered by columns, the dummy state is the last one
+    return (values[:-1].reshape(width, height).T,
+            actions[:-1].reshape(width, height).T)
+
+
+def policy_to_letters(actions: np.ndarray) -> list:
+    """
+    :param actions: a grid of actions as returned by :func:`extract_solution`
+    :return: the rows of the grid as strings of the first letters of the
+        names of the actions
+    """
+    letters = np.array(['?'] * (max(a.value for a in Action) + 1))
+    for a in Action:
+        letters[a.value] = a.name[0]
+    return [''.join(row) for row in letters[actions].tolist()]
+
+
+def run_solver(solver_class, maze: Maze, gamma: float,
+               p_correct: float, initial_values: np.ndarray=None) -> dict:
+    """Constructs the solver, solves the MDP of the maze and extracts the
+    values and actions of all states.
+
+    :param initial_values: the values of a previous solve of the maze as a
+        (height x width) grid to warm start the solver with (see
+        :meth:`mdp_testbed.SolverBase.set_initial_values`) or ``None``
+
+    :return: a dictionary with the ``runtime`` of ``solve_mdp``, the number
+        of ``iterations`` (the ``iterations`` attribute of the solver or the
+        last iteration reported by its progress, otherwise ``None``), the
+        ``trace`` of the progress reported by the solver (a list of
+        :class:`mdp_testbed.Progress`) and the ``values`` and ``actions`` as
+        (height x width) grids
+    """
+    environment = Environment(maze)
+    solver = solver_class(gamma=gamma, p_correct=p_correct)
+    trace = []
+    solver.set_progress_callback(trace.append)
+    if initial_values is not None:
+        solver.set_initial_values(solvers.grid_to_states(initial_values, 0.0))
+    start_time = time.time()
+    solver.solve_mdp(environment)
+    runtime = time.time() - start_time
+
+    values, actions = extract_solution(solver, environment, maze)
+    iterations = getattr(solver, 'iterations', None)
+    if iterations is None and trace:
+        # solvers written by students report their progress instead
+        iterations = trace[-1].iteration
+        if iterations is None:
+            iterations = len(trace)
+    return {'runtime': runtime,
+            'iterations': iterations,
+            'trace': trace,
+            'values': values,
+            'actions': actions}
+
+
+class ThrottledProgress(object):
+    """A progress callback putting the progress reported by a solver to a
+    queue as ``('progress', progress)`` messages, at most one message per
+    :data:`PROGRESS_INTERVAL`. Of the progress reported in between, only
+    the latest one is kept, it is sent with the next message or by
+    :meth:`flush`. This keeps a solver reporting after each of many cheap
+    iterations from flooding the queue and the viewer reading it.
+    """
+    def __init__(self, messages, interval: float=PROGRESS_INTERVAL):
+        self._messages = messages
+        self._interval = interval
+        self._last_time = None
+        self._pending = None
+
+    def __call__(self, progress):
+        now = time.time()
+        if (self._last_time is not None and
+                now - self._last_time < self._interval):
+            self._pending = progress
+            return
+        self._last_time = now
+        self._pending = None
+        self._messages.put(('progress', progress))
+
+    def flush(self):
+        """Sends the latest progress if it has not been sent yet."""
+        if self._pending is not None:
+            self._messages.put(('progress', self._pending))
+            self._pending = None
+
+
+def solve_in_subprocess(messages, solver_name: str, maze: Maze,
+                        gamma: float, p_correct: float,
+                        profile: bool=False,
+                        initial_values: np.ndarray=None):
+    """Runs a single solve for the solution viewer. It is meant to be run in
+    a separate process which can be killed if the solve takes too long.
+
+    Everything is reported through the ``messages`` queue as tuples whose
+    first item is the kind of the message:
+
+    * ``('progress', progress)`` for the :class:`mdp_testbed.Progress`
+      reported by the solver, at most one per :data:`PROGRESS_INTERVAL`
+      (see :class:`ThrottledProgress`), the last one is always sent,
+    * ``('error', phase, exception class name, message)`` if an exception
+      occurred (its traceback is printed to the standard error output), the
+      phase is one of ``'load'``, ``'no-solver'``, ``'construct'``,
+      ``'solve'`` and ``'extract'``,
+    * ``('done', result)`` at the end of a successful solve, the result being
+      a dictionary with the ``runtime``, the ``values`` and ``actions`` grids
+      (see :func:`run_solver`) and the ``profile`` report (a list of lines)
+      and summary if profiling was requested.
+
+    :param solver_name: path to a solution file or a name of a built-in
+        solver
+    :param profile: whether to profile the queries of the solver (see
+        :class:`mdp_testbed.profiling.ProfilingEnvironment`)
+    :param initial_values: the values to warm start the solver with (see
+        :func:`run_solver`)
+    """
+    phase = 'load'
+    progress = ThrottledProgress(messages)
+    try:
+        if is_builtin_solver(solver_name):
+            solver_class = solvers.BUILTIN_SOLVERS[solver_name]
+        else:
+            module = load_solution_module(solver_name)
+            phase = 'no-solver'
+            solver_class = module.Solver
+
+        phase = 'construct'
+        solver = solver_class(gamma=gamma, p_correct=p_correct)
+        solver.set_progress_callback(progress)
+        if initial_values is not None:
+            solver.set_initial_values(
+                solvers.grid_to_states(initial_values, 0.0))
+
+        phase = 'solve'
+        environment = Environment(maze)
+        if profile:
+            environment = profiling.ProfilingEnvironment(environment)
+        start_time = time.time()
+        solver.solve_mdp(environment)
+        result = {'runtime': time.time() - start_time}
+        if profile:
+            result.update(profile=environment.get_report(),
+                          profile_summary=environment.get_summary())
+
+        phase = 'extract'
+        result['values'], result['actions'] = extract_solution(
+            solver, environment, maze)
+    except Exception as e:
+        traceback.print_exc()
+        progress.flush()
+        messages.put(('error', phase, e.__class__.__name__, str(e)))
+        return
+    progress.flush()
+    messages.put(('done', result))
+
+
+def serve_solves(requests, messages):
+    """Runs the solves of the solution viewer one after another in a single
+    long-lived process, so that the models of the mazes stay in its model
+    cache (see :mod:`mdp_testbed.cache`) from one solve to the next, e.g.
+    when solving again with another gamma or another solution file.
+
+    :param requests: a queue of tuples of the arguments of
+        :func:`solve_in_subprocess` following the ``messages``, ``None``
+        stops the process
+    :param messages: the queue the messages of all the solves are put in,
+        each solve ends with a ``'done'`` or ``'error'`` message
+    """
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        solve_in_subprocess(messages, *request)
+
+
+class JobTimeout(BaseException):
+    """Raised in a job which exceeded its time limit. It does not derive from
+    :class:`Exception` so that it cannot be swallowed by a solver catching
+    all exceptions.
+    """
+    pass
+
+
+# caches of the worker process, each worker loads each maze and each
+# solution file only once
+_mazes = dict()
+_solver_classes = dict()
+_warm_starts = cache.WarmStarts()
+
+
+def _raise_timeout(*args):
+    raise JobTimeout()
+
+
+def set_memory_limit(memory_limit: int):
+    """Limits the address space of the current process.
+
+    :param memory_limit: the limit in megabytes or ``None`` for no limit
+    """
+    if memory_limit is None:
+        return
+    if resource is None:
+        print('Memory limit is not supported on this platform, ignoring.',
+              file=sys.stderr)
+        return
+    limit = memory_limit * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_job(solver_name: str, maze_filename: str, gamma: float,
+            p_correct: float, timeout: float=None,
+            warm_start: bool=False) -> dict:
+    """Runs a single solver on a single maze, loading both (unless they are
+    cached). Exceptions raised by the solver, including ``SystemExit`` and
+    other exceptions not derived from :class:`Exception` (but not
+    ``KeyboardInterrupt``), are recorded in the result (and their tracebacks
+    are printed) instead of being propagated.
+
+    :param timeout: time limit of the job in seconds or ``None`` for no limit
+        (supported only on platforms with ``SIGALRM``)
+    :param warm_start: whether to warm start the solver with the values of
+        its previous job on a maze with the same contents in this process
+        (if any)
+    :return: a dictionary with the keys from :data:`CSV_FIELDS` plus the
+        ``values`` and ``actions`` grids (for successful runs)
+    """
+    result = {'solver': solver_name,
+              'maze': maze_filename,
+              'gamma': gamma,
+              'p_correct': p_correct}
+    print('--- {} on {} (gamma = {}, p_correct = {}) ---'.format(
+        solver_name, maze_filename, gamma, p_correct))
+    use_alarm = timeout is not None and hasattr(signal, 'SIGALRM')
+    # everything a solution may raise is caught, even SystemExit, so that a
+    # single solution cannot stop the whole batch
+    # noinspection PyBroadException
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            if solver_name not in _solver_classes:
+                _solver_classes[solver_name] = load_solver_class(solver_name)
+            if maze_filename not in _mazes:
+                _mazes[maze_filename] = Maze.load_from_file(maze_filename)
+            maze = _mazes[maze_filename]
+            initial_values = None
+            if warm_start:
+                previous = _warm_starts.get((solver_name, maze.get_key()),
+                                            gamma, p_correct)
+                if previous is not None:
+                    print('Warm start from gamma = {}, p_correct = {}'.format(
+                        *previous[:2]))
+                    initial_values = previous[2]
+            solution = run_solver(_solver_classes[solver_name], maze,
+                                  gamma, p_correct, initial_values)
+        finally:
+            # the alarm may go off right here too, but then it is caught
+            # below and it cannot go off again
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except KeyboardInterrupt:
+        raise
+    except JobTimeout:
+        result.update(status='timeout',
+                      error='Time limit of {} s exceeded'.format(timeout))
+        return result
+    except BaseException as e:
+        traceback.print_exc()
+        result.update(status='error', error='{}: {}'.format(
+            e.__class__.__name__, e))
+        return result
+
+    if warm_start:
+        _warm_starts.put((solver_name, maze.get_key()), gamma, p_correct,
+                         solution['values'])
+    result.update(solution)
+    result.update(status='ok',
+                  min_value=float(result['values'].min()),
+                  max_value=float(result['values'].max()))
+    print('Time taken: {:.2f} s'.format(result['runtime']))
+    return result
+
+
+def run_batch(solver_names: list, maze_filenames: list, gammas: list,
+              p_corrects: list, callback=None, workers: int=1,
+              timeout: float=None, memory_limit: int=None,
+              warm_start: bool=False) -> list:
+    """Runs all the solvers on all the mazes for all combinations of the
+    parameters (see :func:`run_job`).
+
+    :param callback: if given, it is called with each result as soon as it
+        is available
+    :param workers: number of worker processes (0 for the number of CPUs);
+        if it is 1, the jobs are run one by one in the current process,
+        otherwise each worker process runs a few jobs (see
+        :func:`split_jobs`) and a new one is started for the next few, so
+        that a solution crashing its worker fails only the job it was
+        running
+    :param timeout: time limit of each job in seconds or ``None``; a worker
+        process whose job does not stop within :data:`KILL_GRACE_PERIOD`
+        after it (e.g. since its solver is stuck in C code) is killed
+    :param memory_limit: memory limit of each worker process (or of the
+        current process if ``workers`` is 1) in megabytes or ``None``
+    :param warm_start: whether to warm start each solve with the values of
+        the previous solve of the same solver on the same maze (see
+        :func:`run_job`); with more workers, all the jobs of a solver on the
+        mazes with the same contents are then run by a single worker in
+        order, so that the results do not depend on the number of workers
+    :return: a list of results (see :func:`run_job`) in the order of the
+        jobs
+    """
+    jobs = list(itertools.product(solver_names, maze_filenames, gammas,
+                                  p_corrects))
+    results = [None] * len(jobs)
+    if workers == 1:
+        set_memory_limit(memory_limit)
+        for i, job in enumerate(jobs):
+            results[i] = run_job(*job, timeout=timeout,
+                                 warm_start=warm_start)
+            if callback is not None:
+                callback(results[i])
+        return results
+
+    maze_keys = get_maze_keys(maze_filenames) if warm_start else None
+    tasks = collections.deque(split_jobs(list(enumerate(jobs)),
+                                         workers or os.cpu_count(),
+                                         maze_keys))
+    # worker processes by the connections they send their results through,
+    # each with the jobs it has not finished yet and the time its current
+    # job started
+    running = dict()
+    context = multiprocessing.get_context()
+    # the alarm of a job cannot go off while the solver is stuck in C code,
+    # such a worker is killed once its job is well past its time limit
+    kill_after = None if timeout is None else timeout + KILL_GRACE_PERIOD
+
+    def fail_job(task, status, error):
+        i, (solver_name, maze_filename, gamma, p_correct) = task.pop(0)
+        results[i] = {'solver': solver_name,
+                      'maze': maze_filename,
+                      'gamma': gamma,
+                      'p_correct': p_correct,
+                      'status': status,
+                      'error': error}
+        if task:
+            tasks.appendleft(task)
+        if callback is not None:
+            callback(results[i])
+
+    try:
+        while tasks or running:
+            while tasks and len(running) < (workers or os.cpu_count()):
+                task = tasks.popleft()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_run_task,
+                    args=(sender, task, timeout, memory_limit, warm_start),
+                    daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (process, task, time.time())
+
+            for receiver in multiprocessing.connection.wait(
+                    list(running), None if kill_after is None else 1.0):
+                process, task, _ = running[receiver]
+                try:
+                    i, result = receiver.recv()
+                    task.pop(0)
+                    running[receiver] = (process, task, time.time())
+                except EOFError:
+                    # the worker has exited, if it has not finished all its
+                    # jobs, it died while running the first of them and only
+                    # that one fails, the others are run by another worker
+                    del running[receiver]
+                    receiver.close()
+                    process.join()
+                    if task:
+                        fail_job(task, 'error', 'Worker process died with '
+                                                'exit code {}'.format(
+                                                    process.exitcode))
+                    continue
+                results[i] = result
+                if callback is not None:
+                    callback(result)
+
+            now = time.time()
+            for receiver, (process, task, started) in list(running.items()):
+                if (task and kill_after is not None and
+                        now - started > kill_after):
+                    process.kill()
+                    process.join()
+                    del running[receiver]
+                    receiver.close()
+                    fail_job(task, 'timeout', 'Time limit of {} s exceeded, '
+                                              'the worker process was '
+                                              'killed'.format(timeout))
+    finally:
+        for process, _, _ in running.values():
+            process.terminate()
+    return results
+
+
+def split_jobs(jobs: list, workers: int, maze_keys: dict=None) -> list:
+    """Splits the jobs to the tasks of the worker processes. A task consists
+    of consecutive jobs of the same solver on the same maze, so that the
+    worker loads them only once, and there are at least a few tasks for each
+    worker so that the work is balanced.
+
+    :param jobs: pairs of the index and the parameters of a job
+    :param maze_keys: the keys of the contents of the mazes by their file
+        names (see :func:`get_maze_keys`) if the jobs are warm started, then
+        all the jobs of a solver on the mazes with the same key form a
+        single task, so that each job is warm started from the same previous
+        job as when they are run one by one
+    :return: a list of tasks, i.e. lists of jobs
+    """
+    if maze_keys is not None:
+        tasks = collections.OrderedDict()
+        for job in jobs:
+            solver_name, maze_filename = job[1][:2]
+            tasks.setdefault((solver_name, maze_keys[maze_filename]),
+                             []).append(job)
+        return list(tasks.values())
+
+    size = max(1, -(-len(jobs) // (4 * workers)))
+    tasks = []
+    for _, group in itertools.groupby(jobs, key=lambda job: job[1][:2]):
+        group = list(group)
+        tasks.extend(group[k:k + size] for k in range(0, len(group), size))
+    return tasks
+
+
+def compare_result(result: dict, maze: Maze, solution: reference.Solution,
+                   tolerance: float=1e-3):
+    """Compares a successful result with a reference solution of its maze
+    (see :func:`mdp_testbed.reference.compare_solutions`) and adds the
+    :data:`REFERENCE_FIELDS` to it. The result matches the reference if no
+    value differs by more than the tolerance and no action is worse than
+    the reference one.
+
+    :param tolerance: maximum error of a value and maximum difference of the
+        Q-values of two actions which are considered a tie
+    """
+    try:
+        diff = reference.compare_solutions(maze, reference.Solution(
+            result['values'], result['actions'], result['gamma'],
+            result['p_correct']), solution, tolerance)
+    except ValueError as e:
+        result.update(matches_reference=False, error=str(e))
+        return
+    result.update(max_error=diff.max_error, mean_error=diff.mean_error,
+                  policy_disagreements=diff.policy_disagreements,
+                  matches_reference=(diff.max_error <= tolerance and
+                                     not diff.policy_disagreements))
+    print('--- {} on {}: {} ---'.format(result['solver'], result['maze'],
+                                        reference.format_diff(diff)))
+
+
+def get_maze_keys(maze_filenames: list) -> dict:
+    """
+    :return: the keys of the contents of the mazes (see
+        :meth:`mdp_testbed.internal.Maze.get_key`) by their file names, the
+        key of a maze which cannot be loaded is its file name (the error is
+        then recorded by its jobs)
+    """
+    keys = dict()
+    for maze_filename in maze_filenames:
+        # noinspection PyBroadException
+        try:
+            keys[maze_filename] = Maze.load_from_file(maze_filename).get_key()
+        except Exception:
+            keys[maze_filename] = maze_filename
+    return keys
+
+
+def _run_task(connection, task: list, timeout: float, memory_limit: int,
+              warm_start: bool):
+    """Runs the jobs of a task (see :func:`split_jobs`) one by one in a
+    worker process, sending each result through the connection as soon as
+    it is available.
+    """
+    set_memory_limit(memory_limit)
+    for i, job in task:
+        connection.send((i, run_job(*job, timeout=timeout,
+                                    warm_start=warm_start)))
+    connection.close()
+
+
+class CSVWriter(object):
+    """Writes the summaries of results to a CSV file, one row per result,
+    flushing after each row so that the file can be watched while a batch
+    is running.
+    """
+    def __init__(self, filename: str, fields: list=None):
+        """
+        :param fields: the columns, :data:`CSV_FIELDS` by default
+        """
+        self._file = open(filename, mode='w', newline='')
+        self._writer = csv.DictWriter(self._file, fields or CSV_FIELDS,
+                                      extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, result: dict):
+        self._writer.writerow(result)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def result_to_json(result: dict, fields: list=None) -> dict:
+    r = {k: result.get(k) for k in fields or CSV_FIELDS}
+    if 'values' in result:
+        r['values'] = result['values'].tolist()
+        r['policy'] = policy_to_letters(result['actions'])
+        r['trace'] = [p._asdict() for p in result['trace']]
+    return r
+
+
+def add_arguments(parser):
+    parser.add_argument('-s', '--solution', action='store', required=True,
+                        nargs='+', metavar='filename', dest='solutions',
+                        help='Solution files to run. A name of a built-in '
+                             'solver ({}) can be used instead of a '
+                             'file.'.format(
+                                 ', '.join(sorted(solvers.BUILTIN_SOLVERS))))
+    parser.add_argument('-m', '--maze', action='store', required=True,
+                        nargs='+', metavar='filename', dest='mazes',
+                        help='Maze files to run the solutions on.')
+    parser.add_argument('-g', '--gamma', action='store', nargs='+',
+                        type=float, default=[.95], metavar='gamma',
+                        dest='gammas',
+                        help='Discount factors to run the solutions with. '
+                             'Default: %(default)s.')
+    parser.add_argument('-p', '--p-correct', action='store', nargs='+',
+                        type=float, default=[.8], metavar='p',
+                        dest='p_corrects',
+                        help='Probabilities of correct transition to run '
+                             'the solutions with. Default: %(default)s.')
+    parser.add_argument('--csv', action='store', metavar='filename',
+                        default=None,
+                        help='CSV file to write the summary of each run to '
+                             '(solver, maze, parameters, runtime, iteration '
+                             'count, ...).')
+    parser.add_argument('--json', action='store', metavar='filename',
+                        default=None,
+                        help='JSON file to write the full results to, '
+                             'including the values, the policies and the '
+                             'progress reported by the solvers.')
+    parser.add_argument('-j', '--workers', action='store', type=int,
+                        default=1, metavar='n',
+                        help='Number of worker processes running the '
+                             'solutions in parallel, 0 for the number of '
+                             'CPUs. With 1, the solutions run in this process '
+                             'and a solution crashing the process stops the '
+                             'run. Default: %(default)s.')
+    parser.add_argument('--timeout', action='store', type=float,
+                        default=None, metavar='seconds',
+                        help='Time limit of a single run (including loading '
+                             'the solution and the maze). Runs exceeding it '
+                             'are recorded with the "timeout" status. With '
+                             'more workers, a worker whose run does not stop '
+                             '{:g} s after the limit (e.g. since it is stuck '
+                             'in C code) is killed, with 1 such a run '
+                             'blocks the whole batch.'.format(
+                                 KILL_GRACE_PERIOD))
+    parser.add_argument('--warm-start', action='store_true',
+                        help='Start each solve from the values of the '
+                             'previous solve of the same solution on the '
+                             'same maze (with the closest parameters). '
+                             'With more workers, the solves of a solution '
+                             'on the mazes with the same contents all run '
+                             'in one worker, in the same order as with one. '
+                             'Note that it changes the numbers of '
+                             'iterations.')
+    parser.add_argument('--reference', action='store', nargs='+',
+                        default=None, metavar='filename', dest='references',
+                        help='Reference solutions (exported by the solution '
+                             'viewer) to compare the results with, one for '
+                             'each maze in the order of the mazes. The '
+                             'errors of the values and the number of worse '
+                             'actions are added to the CSV and JSON files '
+                             'and the exit status is 1 if a result differs '
+                             'from its reference.')
+    parser.add_argument('--tolerance', action='store', type=float,
+                        default=1e-3, metavar='t',
+                        help='Maximum error of a value matching the '
+                             'reference, also the maximum difference of the '
+                             'Q-values of equally good actions. Default: '
+                             '%(default)s.')
+    parser.add_argument('--memory-limit', action='store', type=int,
+                        default=None, metavar='MB',
+                        help='Memory (address space) limit of each worker '
+                             'process in megabytes.')
+
+
+def main(ns):
+    fields = CSV_FIELDS
+    references = None
+    mazes = dict()
+    if ns.references is not None:
+        if len(ns.references) != len(ns.mazes):
+            raise ValueError('There must be a reference solution for each '
+                             'of the {} mazes.'.format(len(ns.mazes)))
+        fields = CSV_FIELDS + REFERENCE_FIELDS
+        references = {m: reference.load_solution(fn)
+                      for m, fn in zip(ns.mazes, ns.references)}
+
+    csv_writer = None
+    if ns.csv is not None:
+        csv_writer = CSVWriter(ns.csv, fields)
+
+    def handle_result(result):
+        if references is not None and result['status'] == 'ok':
+            maze_filename = result['maze']
+            if maze_filename not in mazes:
+                mazes[maze_filename] = Maze.load_from_file(maze_filename)
+            compare_result(result, mazes[maze_filename],
+                           references[maze_filename], ns.tolerance)
+        if csv_writer is not None:
+            csv_writer.write(result)
+
+    try:
+        results = run_batch(ns.solutions, ns.mazes, ns.gammas, ns.p_corrects,
+                            handle_result, ns.workers, ns.timeout,
+                            ns.memory_limit, ns.warm_start)
+    finally:
+        if csv_writer is not None:
+            csv_writer.close()
+    if ns.json is not None:
+        with open(ns.json, mode='w') as f:
+            json.dump([result_to_json(r, fields) for r in results], f)
+    failed = sum(1 for r in results if r['status'] != 'ok')
+    summary = '--- {} runs, {} failed'.format(len(results), failed)
+    differing = 0
+    if references is not None:
+        differing = sum(1 for r in results if r['status'] == 'ok' and
+                        not r['matches_reference'])
+        summary += ', {} differ from the reference'.format(differing)
+    print(summary + ' ---')
+    if failed or differing:
+        sys.exit(1)
@@ -0,0 +1,233 @@
+"""Benchmarks of the testbed.
+
+For each maze (the given maze files and synthetic mazes of the given sizes)
+this module measures the time of loading the maze, of constructing the MDP
+model, the throughput of ``get_transition_probability``, the time of full
+solves by the given solvers and the time of repainting the solution view
+(offscreen, if a display is available), along with the peak memory usage.
+Each maze is benchmarked in a fresh process so that the peak memory usage
+is not affected by the other mazes. The results are written to a JSON file
+so that they can be compared between versions. It is used by the ``bench``
+command of the testbed::
+
+    $ python3 -m mdp_testbed bench -o bench.json
+"""
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mdp_testbed.batch as batch
+import mdp_testbed.generator as generator
+from mdp_testbed import Environment
+from mdp_testbed.internal import Action, Maze
+
+# noinspection PyBroadException
+try:
+    import resource
+except:
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_maze(size: int, seed: int=0) -> Maze:
+    """Creates a square open field maze with random walls, a goal per
+    thousand cells and a teleport per two thousand cells.
+    """
+    return generator.generate_maze('open', size, size, .25,
+                                   goals=max(1, size * size // 1000),
+                                   teleports=size * size // 2000, seed=seed)
+
+
+def peak_rss_mb():
+    """
+    :return: the peak resident set size of the current process in
+        megabytes or ``None`` if it cannot be determined
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # the value is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss / 1024
+
+
+def time_transition_probability(environment: Environment,
+                                calls: int) -> float:
+    """
+    :return: the number of ``get_transition_probability`` calls per second,
+        measured on random queries of which a half is between neighbouring
+        (or the same) states and a half is between random states
+    """
+    rnd = random.Random(0)
+    states = environment.get_all_states()
+    actions = list(Action)
+    queries = []
+    for _ in range(calls):
+        i = rnd.randrange(len(states))
+        if rnd.random() < .5:
+            j = min(max(i + rnd.choice((-1, 0, 1)), 0), len(states) - 1)
+        else:
+            j = rnd.randrange(len(states))
+        queries.append((states[i], rnd.choice(actions), states[j]))
+    # the first query compiles the transition model, which is not part of
+    # the throughput
+    environment.get_transition_probability(*queries[0])
+    start_time = time.time()
+    for s, a, t in queries:
+        environment.get_transition_probability(s, a, t)
+    return calls / (time.time() - start_time)
+
+
+def time_repaint(maze: Maze, result: dict):
+    """Measures the time of repainting a solved solution view in a withdrawn
+    window (only the part of the maze in the view is painted).
+
+    :return: the time in seconds or ``None`` if there is no display
+    """
+    import tkinter as tk
+    import mdp_testbed.ui as ui
+    from mdp_testbed.utils import Container
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    view = ui.SolutionView(root, Container(maze), tk.IntVar(value=40),
+                           *[tk.BooleanVar(value=True) for _ in range(7)])
+    view.set_solution(result['values'], result['actions'])
+    start_time = time.time()
+    view.repaint()
+    root.update_idletasks()
+    t = time.time() - start_time
+    root.destroy()
+    return t
+
+
+def bench_maze(name: str, maze_filename: str, size: int, solver_names: list,
+               calls: int, repaint_limit: int) -> dict:
+    """Benchmarks a single maze, either loaded from the given file or a
+    synthetic one of the given size (which is saved to a temporary file
+    first so that loading can be measured too).
+    """
+    tmp_dir = None
+    if maze_filename is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        maze_filename = os.path.join(tmp_dir.name, 'maze.zip')
+        synthetic_maze(size).save_to_file(maze_filename)
+
+    r = {'maze': name}
+    start_time = time.time()
+    maze = Maze.load_from_file(maze_filename)
+    r['load_s'] = time.time() - start_time
+    r['width'] = maze.get_width()
+    r['height'] = maze.get_height()
+    r['cells'] = maze.get_width() * maze.get_height()
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+    start_time = time.time()
+    environment = Environment(maze)
+    r['model_s'] = time.time() - start_time
+    r['transition_calls_per_s'] = time_transition_probability(environment,
+                                                              calls)
+
+    r['solves'] = dict()
+    result = None
+    for solver_name in solver_names:
+        solver_class = batch.load_solver_class(solver_name)
+        start_time = time.time()
+        result = batch.run_solver(solver_class, maze, .95, .8)
+        r['solves'][solver_name] = {'solve_s': result['runtime'],
+                                    'total_s': time.time() - start_time,
+                                    'iterations': result['iterations']}
+
+    r['repaint_s'] = None
+    if result is not None and r['cells'] <= repaint_limit:
+        r['repaint_s'] = time_repaint(maze, result)
+    r['peak_rss_mb'] = peak_rss_mb()
+    return r
+
+
+def run_benchmarks(maze_filenames: list, sizes: list, solver_names: list,
+                   calls: int, repaint_limit: int) -> dict:
+    cases = [(fn, fn, None) for fn in maze_filenames]
+    cases += [('synthetic-{0}x{0}'.format(size), None, size)
+              for size in sizes]
+    results = []
+    for name, maze_filename, size in cases:
+        print('--- Benchmarking {} ---'.format(name))
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            r = executor.submit(bench_maze, name, maze_filename, size,
+                                solver_names, calls, repaint_limit).result()
+        print(format_result(r))
+        results.append(r)
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'results': results}
+
+
+def format_result(r: dict) -> str:
+    def fmt(v, f='{:.3f}'):
+        return 'n/a' if v is None else f.format(v)
+
+    lines = ['{} ({}x{}): load {} s, model {} s, {} transition calls/s, '
+             'repaint {} s, peak RSS {} MB'.format(
+                 r['maze'], r['width'], r['height'], fmt(r['load_s']),
+                 fmt(r['model_s']), fmt(r['transition_calls_per_s'], '{:.0f}'),
+                 fmt(r['repaint_s']), fmt(r['peak_rss_mb'], '{:.1f}'))]
+    for solver_name, s in r['solves'].items():
+        lines.append('    {}: solve {} s, total {} s, {} iterations'.format(
+            solver_name, fmt(s['solve_s']), fmt(s['total_s']),
+            fmt(s['iterations'], '{}')))
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument('-m', '--maze', action='store', nargs='*',
+                        metavar='filename', dest='mazes',
+                        default=sorted(glob.glob(os.path.join(
+                            BASE_DIR, 'mazes', '*.zip'))),
+                        help='Maze files to benchmark. Default: the bundled '
+                             'mazes.')
+    parser.add_argument('--sizes', action='store', nargs='*', type=int,
+                        default=[100, 500, 1000], metavar='n',
+                        help='Sizes of synthetic (n x n) mazes to benchmark. '
+                             'Default: %(default)s.')
+    parser.add_argument('-s', '--solution', action='store', nargs='*',
+                        metavar='filename', dest='solutions',
+                        default=[os.path.join(BASE_DIR, 'dummy_solution.py')],
+                        help='Solution files or built-in solvers to time the '
+                             'full solves of. Default: the dummy solution.')
+    parser.add_argument('--calls', action='store', type=int, default=100000,
+                        metavar='n',
+                        help='Number of get_transition_probability calls to '
+                             'measure the throughput on. Default: '
+                             '%(default)s.')
+    parser.add_argument('--repaint-limit', action='store', type=int,
+                        default=250000, metavar='cells',
+                        help='Mazes with more cells are not repainted. '
+                             'Default: %(default)s.')
+    parser.add_argument('-o', '--output', action='store', metavar='filename',
+                        default='bench.json',
+                        help='JSON file to write the results to. Default: '
+                             '%(default)s.')
+
+
+def main(ns):
+    report = run_benchmarks(ns.mazes, ns.sizes, ns.solutions, ns.calls,
+                            ns.repaint_limit)
+    with open(ns.output, mode='w') as f:
+        json.dump(report, f, indent=2)
+    print('--- Results written to "{}" ---'.format(ns.output))
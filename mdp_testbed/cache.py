@@ -0,0 +1,167 @@
+"""Content-addressed cache of compiled MDP models.
+
+Building the model of a maze (see :class:`mdp_testbed.internal.MDPModel`)
+consists of creating the table of all states and compiling the transitions
+for the probability of correct transition. Both are kept in
+:data:`model_cache` under a hash of the contents of the maze (and the
+probability), so creating another environment for the same maze, e.g. to
+run another solver or to solve again with another gamma, skips them.
+
+The cache is in memory with the least recently used entries evicted. The
+compiled transitions can also be kept on disk, in the directory given by the
+``MDP_TESTBED_MODEL_CACHE`` environment variable, which is useful since the
+workers of the ``run`` command each have their own memory (the solution
+viewer keeps a single process for its solves). The files are not removed
+automatically, a file which cannot be read is built again and overwritten.
+
+:class:`WarmStarts` keeps the values of previous solves, so that the next
+solve of the same maze with different parameters can start from them.
+"""
+import collections
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+
+CACHE_DIR_VARIABLE = 'MDP_TESTBED_MODEL_CACHE'
+
+
+class LRUCache(object):
+    """A mapping keeping at most ``max_entries`` of the most recently used
+    entries.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            return default
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def items(self) -> list:
+        """
+        :return: the entries from the least recently used one, without
+            changing their order
+        """
+        return list(self._entries.items())
+
+
+def hash_arrays(*arrays) -> str:
+    """
+    :return: a hex digest of the shapes, types and contents of the arrays
+    """
+    h = hashlib.sha1()
+    for arr in arrays:
+        h.update('{}{}'.format(arr.dtype.str, arr.shape).encode('ascii'))
+        h.update(np.ascontiguousarray(arr).data)
+    return h.hexdigest()
+
+
+class ModelCache(object):
+    """
+    :ivar directory: directory to keep the arrays cached by
+        :meth:`get_arrays` in or ``None`` to keep them only in memory
+    """
+    def __init__(self, max_entries: int=4, directory: str=None):
+        self.directory = directory
+        self._entries = LRUCache(max_entries)
+
+    def clear(self):
+        """Clears the cache in memory."""
+        self._entries.clear()
+
+    def get(self, key: str, build):
+        """
+        :param build: a function creating the value if it is not cached
+        :return: the cached value of the key
+        """
+        value = self._entries.get(key)
+        if value is None:
+            value = build()
+            self._entries.put(key, value)
+        return value
+
+    def get_arrays(self, key: str, build, names=None) -> dict:
+        """Same as :meth:`get` for values which are dictionaries of (read
+        only) numpy arrays, these are kept on disk too if there is a
+        :attr:`directory`.
+
+        :param names: the names of the arrays the value consists of, a file
+            missing any of them is built again (all the arrays in the file
+            are used if not given)
+        """
+        return self.get(key, lambda: self._load_or_build(key, build, names))
+
+    def _load_or_build(self, key: str, build, names=None) -> dict:
+        if self.directory is None:
+            return build()
+        filename = os.path.join(self.directory, key + '.npz')
+        try:
+            with np.load(filename, allow_pickle=False) as f:
+                arrays = {name: f[name]
+                          for name in (f.files if names is None else names)}
+        except (OSError, ValueError, EOFError, KeyError,
+                zipfile.BadZipFile):
+            # the file is missing, truncated or otherwise damaged
+            arrays = build()
+            os.makedirs(self.directory, exist_ok=True)
+            # written to a temporary file first so that another process
+            # never reads a partially written file
+            tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(tmp_filename, mode='wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_filename, filename)
+            return arrays
+        for arr in arrays.values():
+            arr.setflags(write=False)
+        return arrays
+
+
+class WarmStarts(object):
+    """Values of the previous solves, kept per maze and parameters, for warm
+    starting the following solves of the same maze.
+    """
+    def __init__(self, max_entries: int=16):
+        self._entries = LRUCache(max_entries)
+
+    def put(self, key, gamma: float, p_correct: float, values: np.ndarray):
+        """
+        :param key: identifies the maze (e.g. its
+            :meth:`mdp_testbed.internal.MDPModel.get_key`) together with the
+            solver, the values of one solver should not warm start another
+        """
+        self._entries.put((key, gamma, p_correct), values)
+
+    def get(self, key, gamma: float, p_correct: float) -> tuple:
+        """
+        :return: a tuple ``(gamma, p_correct, values)`` of the solve of the
+            maze with the closest parameters (the same ``p_correct`` and the
+            closest gamma preferred) or ``None`` if there is none
+        """
+        candidates = [(g, p, values)
+                      for (k, g, p), values in self._entries.items()
+                      if k == key]
+        if not candidates:
+            return None
+        return min(candidates,
+                   key=lambda c: (c[1] != p_correct, abs(c[0] - gamma)))
+
+
+model_cache = ModelCache(directory=os.environ.get(CACHE_DIR_VARIABLE))
+"""The cache used by :class:`mdp_testbed.internal.MDPModel`."""
@@ -0,0 +1,203 @@
+"""Generator of large mazes.
+
+The mazes are generated with vectorized NumPy operations, so even mazes
+with millions of cells are generated in seconds. There are three layouts of
+the walls:
+
+* ``'perfect'`` - a perfect maze (there is exactly one path between any two
+  cells) generated by the sidewinder algorithm,
+* ``'rooms'`` - square rooms with a door to each of the neighbouring rooms,
+* ``'open'`` - an open field with randomly placed walls.
+
+The goals and teleports are placed to random cells. It is used by the
+``generate`` command of the testbed::
+
+    $ python3 -m mdp_testbed generate -l perfect --size 1000 1000 big.zip
+"""
+import numpy as np
+
+from mdp_testbed.internal import Maze
+
+
+def _random_walls(shape: tuple, density: float,
+                  rng: np.random.Generator) -> np.ndarray:
+    # single precision is precise enough and it halves the memory
+    return rng.random(shape, dtype='f') < density
+
+
+def _add_random_walls(maze: Maze, wall_density: float,
+                      rng: np.random.Generator):
+    # the shapes are taken from the arrays, which works for empty mazes too
+    maze.vertical_walls[:, 1:-1] = _random_walls(
+        maze.vertical_walls[:, 1:-1].shape, wall_density, rng)
+    maze.horizontal_walls[1:-1, :] = _random_walls(
+        maze.horizontal_walls[1:-1, :].shape, wall_density, rng)
+
+
+def perfect_walls(maze: Maze, wall_density: float,
+                  rng: np.random.Generator):
+    """Builds a perfect maze by the sidewinder algorithm: the top row is a
+    single corridor, each of the other rows is split to random runs of
+    cells open to the east and each run is open to the north in one random
+    cell.
+
+    :param wall_density: the fraction of the walls of the perfect maze which
+        are kept, the others are removed to create loops
+    """
+    h, w = maze.maze_rewards.shape
+    maze.vertical_walls[:, 1:-1] = True
+    maze.horizontal_walls[1:-1, :] = True
+    if w == 0 or h == 0:
+        return
+    maze.vertical_walls[0, 1:-1] = False
+    if h == 1:
+        return
+    east = rng.random((h - 1, w - 1), dtype='f') < .5
+    maze.vertical_walls[1:, 1:-1] = ~east
+
+    # the runs are numbered in the order of the cells, so that the cells of
+    # each run are contiguous in the flattened grid
+    run_ends = np.ones((h - 1, w), dtype='?')
+    run_ends[:, :-1] = ~east
+    starts = np.flatnonzero(np.concatenate(([True], run_ends.ravel()[:-1])))
+    lengths = np.diff(np.append(starts, (h - 1) * w))
+    picks = starts + (rng.random(len(starts)) * lengths).astype('l')
+    ys, xs = np.divmod(picks, w)
+    maze.horizontal_walls[ys + 1, xs] = False
+
+    if wall_density < 1:
+        maze.vertical_walls[:, 1:-1] &= _random_walls(
+            maze.vertical_walls[:, 1:-1].shape, wall_density, rng)
+        maze.horizontal_walls[1:-1, :] &= _random_walls(
+            maze.horizontal_walls[1:-1, :].shape, wall_density, rng)
+
+
+def rooms_walls(maze: Maze, wall_density: float, rng: np.random.Generator,
+                room_size: int=8):
+    """Splits the maze to square rooms with a door in each wall between two
+    neighbouring rooms, so that all the rooms are connected.
+
+    :param wall_density: the probability of a random wall inside a room
+    :param room_size: the length of the side of a room in cells
+    """
+    if room_size < 1:
+        raise ValueError('Room size must be positive.')
+    h, w = maze.maze_rewards.shape
+    _add_random_walls(maze, wall_density, rng)
+
+    def partition(walls, length, size):
+        # walls is indexed by (position along the partition, partition)
+        partitions = np.arange(room_size, size, room_size)
+        walls[:, partitions] = True
+        starts = np.arange(0, length, room_size)
+        lengths = np.minimum(room_size, length - starts)
+        doors = starts + (rng.random((len(partitions), len(starts))) *
+                          lengths).astype('l')
+        walls[doors, partitions[:, np.newaxis]] = False
+
+    partition(maze.vertical_walls, h, w)
+    partition(maze.horizontal_walls.T, w, h)
+
+
+def open_walls(maze: Maze, wall_density: float, rng: np.random.Generator):
+    """
+    :param wall_density: the probability of a wall between two neighbouring
+        cells
+    """
+    _add_random_walls(maze, wall_density, rng)
+
+
+LAYOUTS = {'perfect': (perfect_walls, 1.0),
+           'rooms': (rooms_walls, 0.0),
+           'open': (open_walls, .25)}
+"""The layouts of the walls by their names, each with the function building
+the walls and the default wall density."""
+
+
+def generate_maze(layout: str, width: int, height: int,
+                  wall_density: float=None, goals: int=1, teleports: int=0,
+                  reward: float=-1, goal_reward: float=100,
+                  seed: int=None, **kw) -> Maze:
+    """Generates a maze with the walls in the given layout (see
+    :data:`LAYOUTS`) and the given number of goals and teleports in random
+    cells.
+
+    :param wall_density: the density of the walls, its meaning depends on the
+        layout, ``None`` for the default of the layout
+    :param reward: the reward of the cells which are not goals
+    :param seed: the seed of the random number generator, mazes generated
+        with the same seed and parameters are the same
+    :param kw: parameters of the layout (e.g. ``room_size``)
+    """
+    if layout not in LAYOUTS:
+        raise ValueError('Unknown layout "{}", expected one of: {}'.format(
+            layout, ', '.join(sorted(LAYOUTS))))
+    if goals + teleports > width * height:
+        raise ValueError('There are not enough cells for {} goals and {} '
+                         'teleports.'.format(goals, teleports))
+    build_walls, default_density = LAYOUTS[layout]
+    if wall_density is None:
+        wall_density = default_density
+    rng = np.random.default_rng(seed)
+    maze = Maze(width, height, reward)
+    build_walls(maze, wall_density, rng, **kw)
+
+    cells = rng.choice(width * height, goals + teleports, replace=False)
+    maze.absorbing_goal_states.ravel()[cells[:goals]] = True
+    maze.teleport_states.ravel()[cells[goals:]] = True
+    maze.maze_rewards[maze.absorbing_goal_states] = goal_reward
+    return maze
+
+
+def add_arguments(parser):
+    parser.add_argument('output', action='store', metavar='filename',
+                        help='File to write the maze to. The binary format '
+                             'is used if the name ends with "{}", otherwise '
+                             'the zip format.'.format(Maze.BINARY_EXTENSION))
+    parser.add_argument('-l', '--layout', action='store',
+                        choices=sorted(LAYOUTS), default='perfect',
+                        help='Layout of the walls. Default: %(default)s.')
+    parser.add_argument('--size', action='store', nargs=2, type=int,
+                        default=[100, 100], metavar=('width', 'height'),
+                        help='Size of the maze. Default: %(default)s.')
+    parser.add_argument('-d', '--wall-density', action='store', type=float,
+                        default=None, metavar='d',
+                        help='Density of the walls: the fraction of the walls '
+                             'kept in a perfect maze (less than 1 creates '
+                             'loops), the probability of a wall inside a room '
+                             'or the probability of a wall in an open field. '
+                             'Default: {}.'.format(', '.join(
+                                 '{} for {}'.format(d, layout)
+                                 for layout, (_, d) in sorted(
+                                     LAYOUTS.items()))))
+    parser.add_argument('--room-size', action='store', type=int, default=8,
+                        metavar='n',
+                        help='Side of the rooms of the rooms layout in cells. '
+                             'Default: %(default)s.')
+    parser.add_argument('-g', '--goals', action='store', type=int, default=1,
+                        metavar='n',
+                        help='Number of goals. Default: %(default)s.')
+    parser.add_argument('-t', '--teleports', action='store', type=int,
+                        default=0, metavar='n',
+                        help='Number of teleports. Default: %(default)s.')
+    parser.add_argument('-r', '--reward', action='store', type=float,
+                        default=-1, metavar='r',
+                        help='Reward of the cells which are not goals. '
+                             'Default: %(default)s.')
+    parser.add_argument('--goal-reward', action='store', type=float,
+                        default=100, metavar='r',
+                        help='Reward of the goals. Default: %(default)s.')
+    parser.add_argument('--seed', action='store', type=int, default=None,
+                        metavar='n',
+                        help='Seed of the random number generator. Default: '
+                             'a random seed.')
+
+
+def main(ns):
+    kw = dict()
+    if ns.layout == 'rooms':
+        kw['room_size'] = ns.room_size
+    maze = generate_maze(ns.layout, ns.size[0], ns.size[1], ns.wall_density,
+                         ns.goals, ns.teleports, ns.reward, ns.goal_reward,
+                         ns.seed, **kw)
+    maze.save_to_file(ns.output)
@@ -1,10 +1,12 @@
 import enum
 import io
-import sys
+import os
+import struct
 import zipfile
 
 import numpy as np
 
+from mdp_testbed.cache import hash_arrays, model_cache
 from mdp_testbed.utils import prod
 
 # noinspection PyBroadException
@@ -30,9 +32,28 @@ class Action(enum.Enum):
 
 
 class Maze(object):
+    """A maze that defines the MDP.
+
+    Mazes can be stored in two formats. The zip format is a zip archive of
+    five text files, one per array. The binary format (files with the
+    :attr:`BINARY_EXTENSION`) is a header followed by the raw rewards as
+    little-endian doubles and the four boolean arrays packed to bits. The
+    rewards are memory-mapped when loading a binary maze, so even huge mazes
+    load almost instantly.
+    """
+    BINARY_EXTENSION = '.maze'
+
     _FLOAT_FMT = '%+.4f'
     _BOOL_FMT = '%u'
 
+    _BINARY_MAGIC = b'MDPMAZE\0'
+    _BINARY_VERSION = 1
+    _BINARY_HEADER_FMT = '<8sIQQ'
+    _BINARY_HEADER_SIZE = 64
+
+    _WRITE_BLOCK_CELLS = 1 << 20
+    _ZIP64_CELLS = zipfile.ZIP64_LIMIT // 16
+
     def __init__(self,
                  w: int,
                  h: int,
@@ -144,51 +165,172 @@ class Maze(object):
 
         raise ValueError('Invalid action value')
 
-    def save_to_file(self, filename: str):
+    def get_key(self) -> str:
+        """
+        :return: a hash of the current contents of the maze, the same for
+            mazes with the same contents
+        """
+        return hash_arrays(self.maze_rewards, self.absorbing_goal_states,
+                           self.teleport_states, self.vertical_walls,
+                           self.horizontal_walls)
+
+    def save_to_file(self, filename: str, binary: bool=None):
+        """Saves the maze either in the zip format or in the binary format.
+
+        :param binary: whether to use the binary format; if ``None``, the
+            binary format is used iff the filename ends with
+            :attr:`BINARY_EXTENSION`
+        """
+        if binary is None:
+            binary = filename.endswith(Maze.BINARY_EXTENSION)
         print('Saving maze to "{}"'.format(filename))
-        with zipfile.ZipFile(filename, mode='w') as zf:
-            buf = io.BytesIO()
-            np.savetxt(buf, self.maze_rewards, fmt=Maze._FLOAT_FMT)
-            zf.writestr('rewards.txt', buf.getvalue(),
-                        compress_type=compression)
-
-            buf = io.BytesIO()
-            np.savetxt(buf, self.absorbing_goal_states, fmt=Maze._BOOL_FMT)
-            zf.writestr('goals.txt', buf.getvalue(),
-                        compress_type=compression)
-
-            buf = io.BytesIO()
-            np.savetxt(buf, self.teleport_states, fmt=Maze._BOOL_FMT)
-            zf.writestr('teleports.txt', buf.getvalue(),
-                        compress_type=compression)
-
-            buf = io.BytesIO()
-            np.savetxt(buf, self.vertical_walls, fmt=Maze._BOOL_FMT)
-            zf.writestr('vertical_walls.txt', buf.getvalue(),
-                        compress_type=compression)
-
-            buf = io.BytesIO()
-            np.savetxt(buf, self.horizontal_walls, fmt=Maze._BOOL_FMT)
-            zf.writestr('horizontal_walls.txt', buf.getvalue(),
-                        compress_type=compression)
+        if binary:
+            self._save_binary(filename)
+        else:
+            self._save_zip(filename)
         print('Successfully saved.')
 
+    def _save_zip(self, filename: str):
+        # the members are written to the archive while they are being
+        # formatted, so that their text is never in memory all at once
+        with zipfile.ZipFile(filename, mode='w',
+                             compression=compression) as zf:
+            for name, arr in (('rewards.txt', self.maze_rewards),
+                              ('goals.txt', self.absorbing_goal_states),
+                              ('teleports.txt', self.teleport_states),
+                              ('vertical_walls.txt', self.vertical_walls),
+                              ('horizontal_walls.txt',
+                               self.horizontal_walls)):
+                # the size of a member has to be known in advance to tell
+                # whether it needs the ZIP64 extension, ~16 bytes per value
+                # is an upper bound
+                with zf.open(name, mode='w',
+                             force_zip64=arr.size > Maze._ZIP64_CELLS) as f:
+                    if arr.dtype == np.bool_:
+                        Maze._write_bool_grid(f, arr)
+                    else:
+                        np.savetxt(f, arr, fmt=Maze._FLOAT_FMT)
+
+    @staticmethod
+    def _write_bool_grid(f, grid: np.ndarray):
+        """Writes a boolean grid in the same format as ``np.savetxt`` with
+        :attr:`_BOOL_FMT` does, a block of rows at a time.
+        """
+        h, w = grid.shape
+        rows = max(1, Maze._WRITE_BLOCK_CELLS // max(1, w))
+        for start in range(0, h, rows):
+            block = grid[start:start + rows]
+            # digits at the even positions separated by spaces, the last
+            # space of each row replaced by the newline
+            text = np.full((len(block), max(1, 2 * w)), ord(' '), dtype='u1')
+            text[:, 0:2 * w:2] = block
+            text[:, 0:2 * w:2] += ord('0')
+            text[:, -1] = ord('\n')
+            f.write(text.tobytes())
+
+    def _save_binary(self, filename: str):
+        # the maze may be memory-mapped from the very same file, hence it is
+        # written to a temporary file which then replaces the original one
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, mode='wb') as f:
+            header = struct.pack(Maze._BINARY_HEADER_FMT,
+                                 Maze._BINARY_MAGIC, Maze._BINARY_VERSION,
+                                 self.get_width(), self.get_height())
+            f.write(header.ljust(Maze._BINARY_HEADER_SIZE, b'\0'))
+            f.write(np.ascontiguousarray(self.maze_rewards,
+                                         dtype='<f8').tobytes())
+            for arr in (self.absorbing_goal_states, self.teleport_states,
+                        self.vertical_walls, self.horizontal_walls):
+                f.write(np.packbits(arr, axis=None).tobytes())
+        os.replace(tmp_filename, filename)
+
     @staticmethod
     def load_from_file(filename):
+        """Loads a maze from a file in either the zip format or the binary
+        format, the format is detected from the contents of the file.
+        """
         print('Loading maze from "{}"'.format(filename))
+        with open(filename, mode='rb') as f:
+            magic = f.read(len(Maze._BINARY_MAGIC))
+        if magic == Maze._BINARY_MAGIC:
+            m = Maze._load_binary(filename)
+        else:
+            m = Maze._load_zip(filename)
+        print('Successfully loaded.')
+        return m
+
+    @staticmethod
+    def _load_zip(filename):
         m = Maze(0, 0, 0)
         with zipfile.ZipFile(filename, mode='r') as zf:
             with zf.open('rewards.txt', mode='r') as f:
-                m.maze_rewards = np.loadtxt(f, dtype='d', ndmin=2)
+                m.maze_rewards = Maze._read_grid(f, np.float64)
             with zf.open('goals.txt', mode='r') as f:
-                m.absorbing_goal_states = np.loadtxt(f, dtype='?', ndmin=2)
+                m.absorbing_goal_states = Maze._read_grid(f, np.bool_)
             with zf.open('teleports.txt', mode='r') as f:
-                m.teleport_states = np.loadtxt(f, dtype='?', ndmin=2)
+                m.teleport_states = Maze._read_grid(f, np.bool_)
             with zf.open('vertical_walls.txt', mode='r') as f:
-                m.vertical_walls = np.loadtxt(f, dtype='?', ndmin=2)
+                m.vertical_walls = Maze._read_grid(f, np.bool_)
             with zf.open('horizontal_walls.txt', mode='r') as f:
-                m.horizontal_walls = np.loadtxt(f, dtype='?', ndmin=2)
-        print('Successfully loaded.')
+                m.horizontal_walls = Maze._read_grid(f, np.bool_)
+        # a grid without rows does not tell its width, the size of the maze
+        # is known from the horizontal walls which have at least one row
+        h = m.horizontal_walls.shape[0] - 1
+        w = m.horizontal_walls.shape[1]
+        if m.maze_rewards.size == 0:
+            m.maze_rewards = m.maze_rewards.reshape(h, w)
+            m.absorbing_goal_states = m.absorbing_goal_states.reshape(h, w)
+            m.teleport_states = m.teleport_states.reshape(h, w)
+        if m.vertical_walls.size == 0:
+            m.vertical_walls = m.vertical_walls.reshape(h, w + 1)
+        return m
+
+    @staticmethod
+    def _read_grid(f, dtype) -> np.ndarray:
+        """Reads a grid written by ``np.savetxt`` from a stream."""
+        # parsing the whole member from memory is about twice as fast as
+        # letting np.loadtxt read the zip stream
+        data = f.read()
+        if not data.strip():
+            # np.loadtxt skips empty rows, a grid without columns consists
+            # of nothing else
+            return np.empty((data.count(b'\n'), 0), dtype=dtype)
+        return np.loadtxt(io.BytesIO(data), dtype=dtype, ndmin=2)
+
+    @staticmethod
+    def _load_binary(filename):
+        with open(filename, mode='rb') as f:
+            header = f.read(Maze._BINARY_HEADER_SIZE)
+        _, version, w, h = struct.unpack_from(Maze._BINARY_HEADER_FMT, header)
+        if version != Maze._BINARY_VERSION:
+            raise ValueError('Unsupported version {} of the binary maze '
+                             'format'.format(version))
+
+        shapes = [(h, w), (h, w), (h, w + 1), (h + 1, w)]
+        offset = Maze._BINARY_HEADER_SIZE + 8 * w * h
+        size = offset + sum((a * b + 7) // 8 for a, b in shapes)
+        if os.path.getsize(filename) != size:
+            raise ValueError('Invalid size of the binary maze file')
+
+        m = Maze(0, 0, 0)
+        # the rewards are mapped copy-on-write, so the file is read lazily
+        # and it is never modified by changes of the maze
+        if w * h > 0:
+            m.maze_rewards = np.memmap(filename, dtype='<f8', mode='c',
+                                       offset=Maze._BINARY_HEADER_SIZE,
+                                       shape=(h, w))
+        else:
+            m.maze_rewards = np.empty((h, w), dtype='d')
+        bits = np.memmap(filename, dtype='u1', mode='r', offset=offset)
+        arrays = []
+        for shape in shapes:
+            n = shape[0] * shape[1]
+            packed = bits[:(n + 7) // 8]
+            bits = bits[(n + 7) // 8:]
+            arrays.append(np.unpackbits(packed, count=n).view('?')
+                          .reshape(shape))
+        (m.absorbing_goal_states, m.teleport_states, m.vertical_walls,
+         m.horizontal_walls) = arrays
         return m
 
 
@@ -211,21 +353,31 @@ class State(object):
     There is one dummy state. It is impossible to leave the dummy state.
 
     Each state has a reward. Dummy state has zero reward.
+
+    Each state has a public ``index`` which is its position in the list of
+    all states of the MDP, so that the states can be used to index arrays.
+
+    There are many states in large mazes, hence the class uses ``__slots__``
+    to keep the memory footprint of each instance small.
     """
+    __slots__ = ('index', '_x', '_y', '_reward', '_absorbing', '_telport',
+                 '_dummy_state')
+
     def __init__(self, x: int, y: int, reward: float, absorbing: bool,
-                 teleport: bool):
+                 teleport: bool, index: int):
+        self.index = index
         self._x = x
         self._y = y
         self._reward = reward
         self._absorbing = absorbing
         self._telport = teleport
-        self._dummy = False
+        self._dummy_state = False
 
     @staticmethod
-    def _dummy():
+    def _dummy(index: int):
         # noinspection PyTypeChecker
-        s = State(None, None, 0, None, None)
-        s._dummy = True
+        s = State(None, None, 0, None, None, index)
+        s._dummy_state = True
         return s
 
     def _get_coords(self) -> tuple:
@@ -241,7 +393,7 @@ class State(object):
         return self._reward
 
     def _is_dummy(self) -> bool:
-        return self._dummy
+        return self._dummy_state
 
     def __hash__(self):
         return super().__hash__()
@@ -251,142 +403,272 @@ class State(object):
 
 
 class MDPModel(object):
+    """Transition model of the maze MDP.
+
+    The transitions are compiled once into a sparse, per-action structure in
+    the CSR (compressed sparse row) layout: for each action there is an array
+    of successor indices, an array of the corresponding probabilities and an
+    array of row pointers, where the row of a state is given by its position
+    in :meth:`get_all_states` (see :meth:`get_state_index`). Teleport states
+    are not stored in the rows since their successor distribution is uniform
+    over all regular states; they are answered from a mask instead. The
+    compiled structure is dropped whenever the probability of correct
+    transition changes and rebuilt on the next query.
+
+    The states and the compiled transitions are shared by the models of
+    mazes with the same contents through the model cache (see
+    :mod:`mdp_testbed.cache`).
+    """
     def __init__(self, maze: Maze):
         self._p_correct = 0.8
 
         self._maze = maze
 
-        width = maze.get_width()
-        height = maze.get_height()
-
-        self._all_states = []
+        if np.any(maze.absorbing_goal_states & maze.teleport_states):
+            raise ValueError('State cannot be teleport and absorbing '
+                             'simultaneously')
+
+        self._key = maze.get_key()
+        (states, self._rewards, self._teleport_mask,
+         self._teleports) = model_cache.get(self._key,
+                                            self._build_state_table)
+        # the list is given to the solvers, which must not be able to change
+        # the cached one
+        self._all_states = list(states)
+        self._normal_states = len(self._all_states) - 1
+        self._dummy_state = self._all_states[-1]
+        self._transitions = None
+        self._transition_views = None
+
+    def __getstate__(self):
+        # memory views cannot be pickled (nor copied), they are created
+        # again when needed
+        state = self.__dict__.copy()
+        state['_transition_views'] = None
+        return state
+
+    def _build_state_table(self) -> tuple:
+        """
+        :return: a tuple of the list of all states, the reward vector, the
+            teleport mask (as an array and as a list)
+        """
+        maze = self._maze
+        # the per-cell values are converted to python scalars up front, numpy
+        # scalars would take several times more memory in each state
+        states = [
+            State(x, y, reward, absorbing, teleport, i)
+            for i, ((x, y), reward, absorbing, teleport) in enumerate(zip(
+                prod(maze.get_width(), maze.get_height()),
+                maze.maze_rewards.T.ravel().tolist(),
+                maze.absorbing_goal_states.T.ravel().tolist(),
+                maze.teleport_states.T.ravel().tolist()))]
         # noinspection PyProtectedMember
-        self._dummy_state = State._dummy()
-
-        for x, y in prod(width, height):
-            absorbing = maze.is_absorbing_goal(x, y)
-            teleport = maze.is_teleport_state(x, y)
-
-            if absorbing and teleport:
-                raise ValueError('State cannot be teleport and absorbing '
-                                 'simultaneously')
-
-            reward = maze.get_reward(x, y)
-
-            s = State(x, y, reward, absorbing, teleport)
-            self._all_states.append(s)
+        states.append(State._dummy(len(states)))
 
-        self._normal_states = len(self._all_states)
-        self._all_states.append(self._dummy_state)
+        # rewards and teleport mask over all states in the order of states
+        # (the dummy state has zero reward and is not a teleport)
+        rewards = np.append(maze.maze_rewards.T.ravel(), 0.0)
+        rewards.setflags(write=False)
+        teleport_mask = np.append(maze.teleport_states.T.ravel(), False)
+        teleport_mask.setflags(write=False)
+        return states, rewards, teleport_mask, teleport_mask.tolist()
 
     def set_p_correct(self, p_correct: float):
+        if p_correct != self._p_correct:
+            self._transitions = None
+            self._transition_views = None
         self._p_correct = p_correct
 
+    def get_maze(self) -> Maze:
+        return self._maze
+
+    def get_key(self) -> str:
+        """
+        :return: a hash of the contents of the maze
+        """
+        return self._key
+
     def get_all_states(self):
         return self._all_states
 
+    @staticmethod
+    def get_state_index(state: State) -> int:
+        return state.index
+
+    def get_reward_vector(self) -> np.ndarray:
+        return self._rewards
+
+    def get_teleport_mask(self) -> np.ndarray:
+        return self._teleport_mask
+
+    def get_transition_matrix(self, action: Action,
+                              expand_teleports: bool=False) -> tuple:
+        """Returns the transition matrix of the given action in the CSR
+        layout.
+
+        :param expand_teleports: whether to include the (dense) rows of
+            teleport states; if ``False``, the rows of teleport states are
+            empty and the caller has to handle them using
+            :meth:`get_teleport_mask`
+        :return: a tuple ``(data, indices, indptr)`` of numpy arrays
+        """
+        try:
+            data, indices, indptr = self._get_transitions()[action]
+        except KeyError:
+            raise ValueError('Invalid action')
+        teleports = np.flatnonzero(self._teleport_mask)
+        if not expand_teleports or len(teleports) == 0:
+            return data, indices, indptr
+
+        n = self._normal_states
+        counts = np.diff(indptr)
+        rows = np.repeat(np.arange(len(counts)), counts)
+        counts[teleports] = n
+        full_indptr = np.concatenate(([0], np.cumsum(counts)))
+        full_data = np.empty(full_indptr[-1])
+        full_indices = np.empty(full_indptr[-1], dtype=indices.dtype)
+
+        pos = full_indptr[rows] + np.arange(len(rows)) - indptr[rows]
+        full_data[pos] = data
+        full_indices[pos] = indices
+
+        pos = full_indptr[teleports, np.newaxis] + np.arange(n)
+        full_data[pos] = 1.0 / n
+        full_indices[pos] = np.arange(n)
+        return full_data, full_indices, full_indptr
+
+    def _get_transitions(self):
+        if self._transitions is None:
+            def compile_arrays():
+                return {'{}_{}'.format(a.name, i): arr
+                        for a, csr in self._compile_transitions().items()
+                        for i, arr in enumerate(csr)}
+
+            # the exact value of the probability, whatever its type
+            key = '{}-{}'.format(self._key, float(self._p_correct).hex())
+            arrays = model_cache.get_arrays(
+                key, compile_arrays,
+                ['{}_{}'.format(a.name, i) for a in Action for i in range(3)])
+            self._transitions = {
+                a: tuple(arrays['{}_{}'.format(a.name, i)] for i in range(3))
+                for a in Action}
+        return self._transitions
+
+    def _get_transition_views(self):
+        # scalar lookups are much faster on memory views than on numpy
+        # arrays (they return python numbers), and unlike lists they share
+        # the memory of the arrays
+        if self._transition_views is None:
+            self._transition_views = {
+                a: tuple(memoryview(arr) for arr in csr)
+                for a, csr in self._get_transitions().items()}
+        return self._transition_views
+
+    def _compile_transitions(self) -> dict:
+        """Compiles the transition model for the current probability of
+        correct transition.
+
+        :return: a dictionary mapping each action to a tuple ``(data,
+            indices, indptr)`` of numpy arrays forming the CSR representation
+            of the transition matrix of that action (with empty teleport
+            rows)
+        """
+        maze = self._maze
+        height = maze.get_height()
+        n = self._normal_states
+
+        # all per-cell arrays are flattened in the order of the states, i.e.
+        # x-major, hence the transpositions
+        idx = np.arange(n)
+        xs = idx // height
+        ys = idx % height
+        absorbing = maze.absorbing_goal_states.T.ravel()
+        teleport = maze.teleport_states.T.ravel()
+        regular = ~(absorbing | teleport)
+        walls = {Action.W: maze.vertical_walls[:, :-1].T.ravel(),
+                 Action.E: maze.vertical_walls[:, 1:].T.ravel(),
+                 Action.N: maze.horizontal_walls[:-1, :].T.ravel(),
+                 Action.S: maze.horizontal_walls[1:, :].T.ravel()}
+        # successors in the order W, N, stay, S, E, dummy, i.e. sorted by
+        # their index
+        targets = np.column_stack((idx - height, idx - 1, idx, idx + 1,
+                                   idx + height, np.full(n, n)))
+        valid = np.column_stack((xs > 0, ys > 0, np.ones(n, dtype='?'),
+                                 ys < height - 1, xs < maze.get_width() - 1,
+                                 np.ones(n, dtype='?')))
+        dummy_row = (np.array([n]), np.array([1.0]))
+
+        other_p = (1 - self._p_correct) / 2
+        opposite = {Action.W: Action.E, Action.E: Action.W,
+                    Action.N: Action.S, Action.S: Action.N}
+        transitions = dict()
+        for action in Action:
+            p = {d: other_p for d in Action}
+            p[action] = self._p_correct
+            p[opposite[action]] = 0.0
+
+            moves = dict()
+            p_stay = np.zeros(n)
+            for d in Action:
+                moves[d] = np.where(walls[d], 0.0, p[d])
+                p_stay += np.where(walls[d], p[d], 0.0)
+
+            probs = np.column_stack((moves[Action.W], moves[Action.N], p_stay,
+                                     moves[Action.S], moves[Action.E],
+                                     np.zeros(n)))
+            probs[~regular, :] = 0
+            probs[absorbing, -1] = 1
+            keep = (probs > 0) & valid
+
+            data = np.concatenate((probs[keep], dummy_row[1]))
+            indices = np.concatenate((targets[keep], dummy_row[0]))
+            indptr = np.concatenate(([0], np.cumsum(keep.sum(axis=1)),
+                                     [keep.sum() + 1]))
+            for arr in (data, indices, indptr):
+                arr.setflags(write=False)
+            transitions[action] = (data, indices, indptr)
+        return transitions
+
     # noinspection PyProtectedMember
     def get_transition_probability(self,
                                    current_state: State,
                                    action: Action,
                                    future_state: State) -> float:
-        from_s = current_state
-        to_s = future_state
-
-        # dummy state
-        if from_s == self._dummy_state and to_s != self._dummy_state:
-            return 0
-
-        if from_s == self._dummy_state and to_s == self._dummy_state:
-            return 1
-
-        # absorbing state
-        if from_s._is_absorbing():
-            if future_state != self._dummy_state:
-                return 0
-
-            if to_s == self._dummy_state:
-                return 1
+        from_i = current_state.index
+        to_i = future_state.index
 
         # teleport state
-        if from_s._is_teleport():
-            if to_s != self._dummy_state:
+        if self._teleports[from_i]:
+            if to_i != self._normal_states:
                 return 1.0 / self._normal_states
             return 0
 
-        # non-teleport, non-absorbing, non-dummy
-        if to_s == self._dummy_state:
-            return 0
-
-        fx, fy = from_s._get_coords()
-
-        tx, ty = to_s._get_coords()
-
-        dx = fx - tx
-        dy = fy - ty
-        delta = abs(dx) + abs(dy)
-
-        # are states neighbors?
-        if delta > 1:
-            return 0
-
-        wall_w = self._maze.is_wall(fx, fy, Action.W)
-        wall_e = self._maze.is_wall(fx, fy, Action.E)
-        wall_n = self._maze.is_wall(fx, fy, Action.N)
-        wall_s = self._maze.is_wall(fx, fy, Action.S)
-
-        other_p = (1 - self._p_correct) / 2
-
-        p_w = other_p
-        p_e = other_p
-        p_n = other_p
-        p_s = other_p
-        p_stay = 0.0
+        try:
+            data, indices, indptr = self._get_transition_views()[action]
+        except KeyError:
+            raise ValueError('Invalid action')
+        for k in range(indptr[from_i], indptr[from_i + 1]):
+            if indices[k] == to_i:
+                return data[k]
+        return 0
 
-        if action is Action.W:
-            p_w = self._p_correct
-            p_e = 0.0
-        elif action is Action.E:
-            p_e = self._p_correct
-            p_w = 0.0
-        elif action is Action.N:
-            p_n = self._p_correct
-            p_s = 0.0
-        elif action is Action.S:
-            p_s = self._p_correct
-            p_n = 0.0
-        else:
+    # noinspection PyProtectedMember
+    def get_successors(self, state: State, action: Action) -> list:
+        i = state.index
+        if self._teleports[i]:
+            p = 1.0 / self._normal_states
+            return [(s, p) for s in self._all_states[:self._normal_states]]
+
+        try:
+            data, indices, indptr = self._get_transition_views()[action]
+        except KeyError:
             raise ValueError('Invalid action')
+        return [(self._all_states[indices[k]], data[k])
+                for k in range(indptr[i], indptr[i + 1])]
 
-        if wall_w:
-            p_stay += p_w
-            p_w = 0
-        if wall_e:
-            p_stay += p_e
-            p_e = 0
-        if wall_n:
-            p_stay += p_n
-            p_n = 0
-        if wall_s:
-            p_stay += p_s
-            p_s = 0
-
-        if fx == tx:
-            if fy > ty:
-                return p_n
-            elif fy < ty:
-                return p_s
-        elif fy == ty:
-            if fx > tx:
-                return p_w
-            elif fx < tx:
-                return p_e
-
-        if fx == tx and fy == ty:
-            return p_stay
-
-        print('Bad direction', file=sys.stderr)
-        return 0
+    def get_all_successors(self) -> dict:
+        return {s: {a: self.get_successors(s, a) for a in Action}
+                for s in self._all_states}
 
     @staticmethod
     def get_reward(state: State):
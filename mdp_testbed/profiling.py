@@ -0,0 +1,126 @@
+"""Profiling of solvers.
+
+:class:`ProfilingEnvironment` wraps an :class:`mdp_testbed.Environment` and
+records how many times the solver called each of the query methods and how
+much time it spent in them. For ``get_transition_probability`` it also
+counts how many of the answers were zero, i.e. how many queries asked about
+impossible transitions.
+
+The progress a solver reports through
+:meth:`mdp_testbed.SolverBase.report_progress` can be written to a CSV trace
+file by :func:`write_trace`.
+"""
+import csv
+import time
+
+from mdp_testbed import Environment, Progress
+from mdp_testbed.internal import Action, State
+
+
+class QueryStats(object):
+    """Number of calls of a single query method and the cumulative time spent
+    in it.
+    """
+    __slots__ = ('calls', 'time')
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+
+    def __str__(self):
+        return '{} calls, {:.2f} s'.format(self.calls, self.time)
+
+
+# noinspection PyProtectedMember,PyMissingConstructor
+class ProfilingEnvironment(Environment):
+    """
+    An environment which behaves exactly as the wrapped one (it shares its
+    MDP model) but records the statistics of the calls of
+    ``get_transition_probability``, ``get_reward`` and ``get_all_states``.
+    """
+    def __init__(self, environment: Environment):
+        self._transition_model = environment._transition_model
+        self.transition_probability_stats = QueryStats()
+        self.reward_stats = QueryStats()
+        self.all_states_stats = QueryStats()
+        self.zero_probabilities = 0
+        self.nonzero_probabilities = 0
+
+    def get_reward(self, state: State) -> float:
+        start_time = time.perf_counter()
+        r = super().get_reward(state)
+        self.reward_stats.time += time.perf_counter() - start_time
+        self.reward_stats.calls += 1
+        return r
+
+    def get_all_states(self) -> list:
+        start_time = time.perf_counter()
+        states = super().get_all_states()
+        self.all_states_stats.time += time.perf_counter() - start_time
+        self.all_states_stats.calls += 1
+        return states
+
+    def get_transition_probability(self,
+                                   from_state: State,
+                                   action: Action,
+                                   to_state: State) -> float:
+        start_time = time.perf_counter()
+        p = super().get_transition_probability(from_state, action, to_state)
+        self.transition_probability_stats.time += (time.perf_counter() -
+                                                   start_time)
+        self.transition_probability_stats.calls += 1
+        if p == 0:
+            self.zero_probabilities += 1
+        else:
+            self.nonzero_probabilities += 1
+        return p
+
+    def get_total_time(self) -> float:
+        """
+        :return: the total time in seconds spent in the recorded queries
+        """
+        return (self.transition_probability_stats.time +
+                self.reward_stats.time + self.all_states_stats.time)
+
+    def get_zero_fraction(self) -> float:
+        """
+        :return: the fraction of ``get_transition_probability`` calls which
+            returned zero (0 if there were no calls)
+        """
+        calls = self.transition_probability_stats.calls
+        if calls == 0:
+            return 0.0
+        return self.zero_probabilities / calls
+
+    def get_report(self) -> list:
+        """
+        :return: a list of lines describing the recorded statistics
+        """
+        return ['get_transition_probability: {} ({} zero, {} non-zero, '
+                '{:.1f} % zero)'.format(self.transition_probability_stats,
+                                        self.zero_probabilities,
+                                        self.nonzero_probabilities,
+                                        100 * self.get_zero_fraction()),
+                'get_reward: {}'.format(self.reward_stats),
+                'get_all_states: {}'.format(self.all_states_stats)]
+
+    def get_summary(self) -> str:
+        """
+        :return: a one-line summary of the recorded statistics
+        """
+        return ('{} transition queries ({:.1f} % zero), {} reward queries, '
+                '{:.2f} s in queries'.format(
+                    self.transition_probability_stats.calls,
+                    100 * self.get_zero_fraction(), self.reward_stats.calls,
+                    self.get_total_time()))
+
+
+def write_trace(filename: str, trace: list):
+    """Writes the progress of a solve to a CSV file, one row per iteration.
+
+    :param trace: a list of :class:`mdp_testbed.Progress` records
+    """
+    with open(filename, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(Progress._fields)
+        writer.writerows(trace)
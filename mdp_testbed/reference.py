@@ -0,0 +1,121 @@
+"""Comparison of solutions with reference solutions.
+
+A solution (the value grid and the action grid as returned by
+:func:`mdp_testbed.batch.extract_solution`, along with the parameters of the
+MDP it solves) can be exported by :func:`save_solution` to a compressed
+NumPy ``.npz`` file and loaded back by :func:`load_solution`.
+:func:`compare_solutions` compares a solution with a reference one, it
+reports the errors of the values and the states where the actions disagree.
+Two different actions whose Q-values (computed from the reference values)
+are within the tolerance are considered a tie, not a disagreement.
+"""
+import collections
+
+import numpy as np
+
+from mdp_testbed import Environment
+from mdp_testbed.internal import Action, Maze
+from mdp_testbed.solvers import SparseModel, grid_to_states
+
+SOLUTION_EXTENSION = '.npz'
+
+Solution = collections.namedtuple('Solution', ['values', 'actions', 'gamma',
+                                               'p_correct'])
+Solution.__doc__ = """A solution of the MDP of a maze.
+
+The ``values`` and the ``actions`` (as :class:`Action` values) are
+(height x width) grids, ``gamma`` and ``p_correct`` are the parameters of the
+MDP.
+"""
+
+SolutionDiff = collections.namedtuple('SolutionDiff', [
+    'max_error', 'mean_error', 'policy_disagreements', 'errors',
+    'disagreements'])
+SolutionDiff.__doc__ = """Differences of a solution from a reference one.
+
+``max_error`` and ``mean_error`` are the maximum and the mean absolute error
+of the values, ``policy_disagreements`` is the number of cells whose action
+is worse than the reference one, ``errors`` are the absolute errors of the
+values and ``disagreements`` the mask of the disagreeing cells, both as
+(height x width) grids.
+"""
+
+
+def save_solution(filename: str, solution: Solution):
+    print('Saving solution to "{}"'.format(filename))
+    np.savez_compressed(filename, values=solution.values,
+                        actions=solution.actions, gamma=solution.gamma,
+                        p_correct=solution.p_correct)
+    print('Successfully saved.')
+
+
+def load_solution(filename: str) -> Solution:
+    print('Loading solution from "{}"'.format(filename))
+    with np.load(filename, allow_pickle=False) as f:
+        solution = Solution(f['values'].astype('d'), f['actions'].astype('b'),
+                            float(f['gamma']), float(f['p_correct']))
+    if solution.values.shape != solution.actions.shape:
+        raise ValueError('The values and the actions of the solution have '
+                         'different shapes.')
+    print('Successfully loaded.')
+    return solution
+
+
+def get_q_values(maze: Maze, values: np.ndarray, gamma: float,
+                 p_correct: float) -> np.ndarray:
+    """
+    :param values: the values of the cells as a (height x width) grid
+    :return: the Q-values of the actions computed from the given values as
+        an array of (height x width) grids indexed by the values of the
+        actions
+    """
+    environment = Environment(maze)
+    environment.set_probability_of_correct_transition(p_correct)
+    model = SparseModel(environment)
+    q = model.backup(grid_to_states(values, 0.0), gamma)[:, :-1]
+    grids = np.zeros((max(a.value for a in Action) + 1,) + values.shape)
+    for a, row in zip(model.actions, q):
+        grids[a.value] = row.reshape(maze.get_width(), maze.get_height()).T
+    return grids
+
+
+def compare_solutions(maze: Maze, solution: Solution, reference: Solution,
+                      tolerance: float=1e-3) -> SolutionDiff:
+    """Compares a solution of the MDP of the maze with a reference solution.
+
+    :param tolerance: maximum difference of the Q-values of two actions
+        which are considered a tie
+    """
+    shape = (maze.get_height(), maze.get_width())
+    if solution.values.shape != shape or reference.values.shape != shape:
+        raise ValueError('The solutions are not solutions of a {}x{} '
+                         'maze.'.format(maze.get_width(), maze.get_height()))
+    if (solution.gamma, solution.p_correct) != (reference.gamma,
+                                                reference.p_correct):
+        print('Warning: the solutions are solutions of different MDPs '
+              '(gamma {} vs {}, p_correct {} vs {}).'.format(
+                  solution.gamma, reference.gamma, solution.p_correct,
+                  reference.p_correct))
+
+    errors = np.abs(solution.values - reference.values)
+    disagreements = solution.actions != reference.actions
+    # the Q-values are needed only to recognize ties, most often there is
+    # nothing to recognize
+    if disagreements.any():
+        q = get_q_values(maze, reference.values, reference.gamma,
+                         reference.p_correct)
+        actions_q = np.take_along_axis(
+            q, solution.actions[np.newaxis].astype('l'), axis=0)[0]
+        reference_q = np.take_along_axis(
+            q, reference.actions[np.newaxis].astype('l'), axis=0)[0]
+        disagreements &= actions_q < reference_q - tolerance
+    return SolutionDiff(float(errors.max()) if errors.size else 0.0,
+                        float(errors.mean()) if errors.size else 0.0,
+                        int(np.count_nonzero(disagreements)), errors,
+                        disagreements)
+
+
+def format_diff(diff: SolutionDiff) -> str:
+    return ('max. error {:.4g}, mean error {:.4g}, {} policy '
+            'disagreements'.format(diff.max_error, diff.mean_error,
+                                   diff.policy_disagreements))
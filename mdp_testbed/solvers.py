@@ -0,0 +1,722 @@
+"""Reference solvers shipped with the testbed.
+
+These solvers are meant as fast baselines for comparing other solvers
+against. Unlike the solvers written by students, they are part of the testbed
+and hence they are allowed to access the internals of the environment.
+"""
+import warnings
+
+import numpy as np
+
+from mdp_testbed import Environment, SolverBase
+from mdp_testbed.internal import Action, Maze, State
+from mdp_testbed.utils import csr_dot, csr_rows, csr_to_padded
+
+# noinspection PyBroadException
+try:
+    import scipy.sparse
+    import scipy.sparse.csgraph
+    import scipy.sparse.linalg
+    have_scipy = True
+except:
+    have_scipy = False
+
+DENSE_SOLVE_LIMIT = 2500
+"""Maximum number of states for solving the policy evaluation with a dense
+solver when scipy is not available."""
+
+
+class ArraySolverBase(SolverBase):
+    """Base class for solvers keeping the values and the policy in arrays
+    indexed by the state indices (see :attr:`State.index`).
+
+    :ivar epsilon: maximum error of the values
+    :ivar max_iterations: maximum number of iterations
+    :ivar iterations: number of iterations performed by the last solve
+    :ivar residuals: the maximum Bellman residual of each iteration of the
+        last solve
+    """
+    def __init__(self, gamma: float=.99, p_correct: float=.8,
+                 epsilon: float=1e-3, max_iterations: int=10000):
+        super().__init__(gamma, p_correct)
+        if epsilon <= 0:
+            raise ValueError('Epsilon must be positive.')
+        self.epsilon = epsilon
+        self.max_iterations = max_iterations
+        self.environment = None
+        self.values = None
+        self.policy = None
+        self.iterations = 0
+        self.residuals = []
+
+    def _get_residual_threshold(self) -> float:
+        """
+        :return: the threshold of the Bellman residual guaranteeing that the
+            values are within ``epsilon`` of the optimal ones
+        """
+        if 0 < self.gamma < 1:
+            return self.epsilon * (1 - self.gamma) / self.gamma
+        return self.epsilon
+
+    def solve_mdp(self, environment: Environment):
+        self.environment = environment
+        self.environment.set_probability_of_correct_transition(self.p_correct)
+        self.iterations = 0
+        self.residuals = []
+        self._solve()
+
+    def _solve(self):
+        raise NotImplementedError()
+
+    def _get_initial_values(self, n: int) -> np.ndarray:
+        """
+        :return: the values of the ``n`` states to start from, the
+            :attr:`initial_values` if they were given (for the right number
+            of states), otherwise zeros
+        """
+        v = np.zeros(n)
+        if self.initial_values is not None and len(self.initial_values) == n:
+            v[:-1] = self.initial_values[:-1]
+        return v
+
+    def _record_iteration(self, residual: float, policy_changes: int=None):
+        self.iterations += 1
+        self.residuals.append(residual)
+        self.report_progress(self.iterations, residual, policy_changes)
+
+    def get_action_for_state(self, state: State) -> Action:
+        return Action(self.policy[state.index])
+
+    def get_value_for_state(self, state: State) -> float:
+        return float(self.values[state.index])
+
+    def get_values(self) -> np.ndarray:
+        return self.values
+
+    def get_policy(self) -> np.ndarray:
+        return self.policy
+
+
+# noinspection PyProtectedMember
+def get_maze(environment: Environment) -> Maze:
+    return environment._transition_model.get_maze()
+
+
+def grid_to_states(grid: np.ndarray, dummy) -> np.ndarray:
+    """Flattens a (height x width) grid of per-cell values into an array in
+    the order of states, with the value for the dummy state appended.
+    """
+    return np.append(grid.T.ravel(), dummy)
+
+
+class ValueIterationSolver(ArraySolverBase):
+    """Value iteration vectorized over the maze grid.
+
+    Instead of working with the transition model, the expected values of the
+    successors are computed by shifting the grid of values in each of the
+    four directions, with the wall arrays of the maze deciding where the
+    agent stays in place. Teleport states use the mean value of all regular
+    states, absorbing goals lead to the dummy state whose value is always
+    zero.
+    """
+    def _solve(self):
+        maze = get_maze(self.environment)
+        walls = {Action.W: maze.vertical_walls[:, :-1],
+                 Action.E: maze.vertical_walls[:, 1:],
+                 Action.N: maze.horizontal_walls[:-1, :],
+                 Action.S: maze.horizontal_walls[1:, :]}
+        perpendicular = {Action.W: (Action.N, Action.S),
+                         Action.E: (Action.N, Action.S),
+                         Action.N: (Action.W, Action.E),
+                         Action.S: (Action.W, Action.E)}
+        rewards = maze.maze_rewards
+        teleports = maze.teleport_states
+        absorbing = maze.absorbing_goal_states
+        other_p = (1 - self.p_correct) / 2
+        actions = list(Action)
+        threshold = self._get_residual_threshold()
+
+        def shift(v, action):
+            # value of the cell in the given direction, the value of the cell
+            # itself where there is a wall and zero outside the grid
+            s = np.zeros_like(v)
+            if action is Action.W:
+                s[:, 1:] = v[:, :-1]
+            elif action is Action.E:
+                s[:, :-1] = v[:, 1:]
+            elif action is Action.N:
+                s[1:, :] = v[:-1, :]
+            else:
+                s[:-1, :] = v[1:, :]
+            return np.where(walls[action], v, s)
+
+        v = self._get_initial_values(rewards.size + 1)[:-1].reshape(
+            rewards.shape[::-1]).T
+        q = np.empty((len(actions),) + v.shape)
+        while self.iterations < self.max_iterations:
+            shifted = {a: shift(v, a) for a in actions}
+            for i, a in enumerate(actions):
+                p1, p2 = perpendicular[a]
+                q[i] = (self.p_correct * shifted[a] +
+                        other_p * (shifted[p1] + shifted[p2]))
+            q[:, teleports] = v.mean()
+            q[:, absorbing] = 0
+            q *= self.gamma
+            q += rewards
+
+            new_v = q.max(axis=0)
+            residual = float(np.abs(new_v - v).max()) if v.size else 0.0
+            v = new_v
+            self._record_iteration(residual)
+            if residual < threshold:
+                break
+
+        self.values = grid_to_states(v, 0.0)
+        policy = np.array([a.value for a in actions])[q.argmax(axis=0)]
+        self.policy = grid_to_states(policy, Action.N.value)
+
+
+class SparseModel(object):
+    """The MDP of an environment in the form of sparse transition matrices,
+    providing the vectorized operations needed by the policy-based solvers.
+
+    The rows of teleport states are not stored in the matrices. Since a
+    teleport leads to each regular state with the same probability, their
+    part of any matrix-vector product is just the mean of the regular
+    entries of the vector.
+    """
+    # noinspection PyProtectedMember
+    def __init__(self, environment: Environment):
+        model = environment._transition_model
+        self.actions = list(Action)
+        self.rewards = model.get_reward_vector()
+        self.n = len(self.rewards)
+        self.matrices = [model.get_transition_matrix(a, False)
+                         for a in self.actions]
+        self.rows = [csr_rows(indptr) for _, _, indptr in self.matrices]
+        self.teleports = model.get_teleport_mask()
+        # the dummy state is always the last one and its value is always 0
+        self.dummy = self.n - 1
+
+    def _dot(self, data, indices, rows, v):
+        r = csr_dot(data, indices, rows, v, self.n)
+        r[self.teleports] = v[:self.dummy].mean()
+        return r
+
+    def backup(self, v: np.ndarray, gamma: float) -> np.ndarray:
+        """
+        :return: the Q-values of all actions (rows) in all states (columns)
+        """
+        q = np.empty((len(self.actions), self.n))
+        for i, ((data, indices, _), rows) in enumerate(zip(self.matrices,
+                                                           self.rows)):
+            q[i] = self._dot(data, indices, rows, v)
+        q *= gamma
+        q += self.rewards
+        return q
+
+    def policy_matrix(self, policy: np.ndarray) -> tuple:
+        """
+        :param policy: an array of indices into :attr:`actions`
+        :return: the transition matrix of the given policy (without the rows
+            of teleport states) as a tuple ``(data, indices, rows)`` of its
+            entries
+        """
+        data = []
+        indices = []
+        rows = []
+        for i, ((d, ind, _), r) in enumerate(zip(self.matrices, self.rows)):
+            mask = policy[r] == i
+            data.append(d[mask])
+            indices.append(ind[mask])
+            rows.append(r[mask])
+        return (np.concatenate(data), np.concatenate(indices),
+                np.concatenate(rows))
+
+    def transitions(self) -> tuple:
+        """
+        :return: the transitions of all actions together as a tuple
+            ``(data, indices, rows)`` in the layout of :meth:`policy_matrix`
+        """
+        return (np.concatenate([data for data, _, _ in self.matrices]),
+                np.concatenate([indices for _, indices, _ in self.matrices]),
+                np.concatenate(self.rows))
+
+    def distances_to_exits(self, data, indices, rows) -> np.ndarray:
+        """
+        :param data: the probabilities of the transitions of a matrix in the
+            layout of :meth:`policy_matrix`
+        :return: the least number of transitions needed to get from each
+            state to the dummy state or to a teleport state (whose rows are
+            not stored) with a non-zero probability, ``inf`` where it is
+            impossible
+        """
+        possible = data > 0
+        rows = rows[possible]
+        indices = indices[possible]
+        exits = self.teleports.copy()
+        exits[self.dummy] = True
+        exits = np.flatnonzero(exits)
+        if have_scipy:
+            # the transitions are reversed and an extra node leading to all
+            # the exits is the source of the search
+            n = self.n
+            graph = scipy.sparse.csr_matrix(
+                (np.ones(len(rows) + len(exits)),
+                 (np.concatenate((indices, np.full(len(exits), n))),
+                  np.concatenate((rows, exits)))), shape=(n + 1, n + 1))
+            d = scipy.sparse.csgraph.dijkstra(graph, indices=n,
+                                              unweighted=True)
+            return d[:n] - 1
+
+        # breadth-first search over the reversed transitions
+        order = np.argsort(indices, kind='stable')
+        predecessors = rows[order]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(
+            indices, minlength=self.n))))
+        d = np.full(self.n, np.inf)
+        d[exits] = 0
+        frontier = exits
+        level = 0
+        while len(frontier):
+            level += 1
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            entries = (np.repeat(starts - np.cumsum(counts) + counts, counts) +
+                       np.arange(counts.sum()))
+            frontier = np.unique(predecessors[entries])
+            frontier = frontier[np.isinf(d[frontier])]
+            d[frontier] = level
+        return d
+
+    def is_proper(self, policy: np.ndarray) -> bool:
+        """
+        :param policy: an array of indices into :attr:`actions`
+        :return: whether the dummy state or a teleport can be reached from
+            every state by following the policy, i.e. whether the values of
+            the policy are finite even when ``gamma`` is 1
+        """
+        return bool(np.all(np.isfinite(self.distances_to_exits(
+            *self.policy_matrix(policy)))))
+
+    def proper_policy(self) -> np.ndarray:
+        """
+        :return: a policy (as indices into :attr:`actions`) taking each state
+            closer to the nearest exit (see :meth:`distances_to_exits`) with
+            the highest probability, which makes it proper wherever possible
+        """
+        d = self.distances_to_exits(*self.transitions())
+        progress = np.array([
+            np.bincount(rows, weights=data * (d[indices] < d[rows]),
+                        minlength=self.n)
+            for (data, indices, _), rows in zip(self.matrices, self.rows)])
+        return progress.argmax(axis=0)
+
+    def evaluation_sweeps(self, v: np.ndarray, policy: np.ndarray,
+                          gamma: float, sweeps: int,
+                          threshold: float=None) -> np.ndarray:
+        """Performs at most the given number of sweeps of iterative policy
+        evaluation starting from the values ``v``. If ``threshold`` is given,
+        stops as soon as the values change by less than the threshold.
+        """
+        data, indices, rows = self.policy_matrix(policy)
+        for _ in range(sweeps):
+            new_v = self.rewards + gamma * self._dot(data, indices, rows, v)
+            if threshold is not None and np.abs(new_v - v).max() < threshold:
+                return new_v
+            v = new_v
+        return v
+
+    def evaluate(self, policy: np.ndarray, gamma: float) -> np.ndarray:
+        """Solves the linear system ``(I - gamma * P) v = r`` for the values
+        of the given policy, where the dummy state is left out (its value is
+        zero). The system is solved by a sparse direct solver if scipy is
+        available, otherwise by a dense one if the system is small enough.
+
+        The teleport rows make ``P`` a sparse matrix plus the rank-one matrix
+        ``t * 1^T / m`` (``t`` being the teleport indicator and ``m`` the
+        number of regular states), so the system is solved for the sparse
+        part only and corrected by the Sherman-Morrison formula.
+
+        :return: the values of the policy or ``None`` if the system cannot be
+            solved directly, e.g. because it is singular (the policy never
+            reaches the goals and ``gamma`` is 1)
+        """
+        m = self.dummy
+        if not have_scipy and m > DENSE_SOLVE_LIMIT:
+            return None
+        data, indices, rows = self.policy_matrix(policy)
+        if gamma >= 1 and not np.all(np.isfinite(self.distances_to_exits(
+                data, indices, rows))):
+            # singular, checked beforehand since the sparse solver reports
+            # it on the standard error output
+            return None
+        mask = (rows != self.dummy) & (indices != self.dummy)
+        data = -gamma * data[mask]
+        indices = indices[mask]
+        rows = rows[mask]
+        rhs = np.column_stack((self.rewards[:m], self.teleports[:m]))
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            # noinspection PyBroadException
+            try:
+                if have_scipy:
+                    a = scipy.sparse.csc_matrix((data, (rows, indices)),
+                                                shape=(m, m))
+                    a = a + scipy.sparse.identity(m, format='csc')
+                    x = scipy.sparse.linalg.splu(a).solve(rhs)
+                else:
+                    a = np.identity(m)
+                    np.add.at(a, (rows, indices), data)
+                    x = np.linalg.solve(a, rhs)
+            except Exception:
+                return None
+            c = gamma / m
+            v = x[:, 0] + x[:, 1] * (c * x[:, 0].sum() /
+                                     (1 - c * x[:, 1].sum()))
+        if not np.all(np.isfinite(v)):
+            return None
+        return np.append(v, 0.0)
+
+
+class PolicyIterationSolver(ArraySolverBase):
+    """Policy iteration.
+
+    The policy is evaluated exactly by solving the linear system
+    ``(I - gamma * P) v = r`` with a sparse direct solver if scipy is
+    available (see :meth:`SparseModel.evaluate`). Without discounting, the
+    solve starts from a proper policy (see :meth:`SparseModel.proper_policy`)
+    so that the system is not singular. If the system cannot be solved
+    directly, the evaluation falls back to iterative sweeps until the
+    values change by less than the residual threshold (but at most
+    ``max_iterations`` sweeps). The solve stops when the policy does not
+    change anymore.
+    """
+    def _solve(self):
+        model = SparseModel(self.environment)
+        threshold = self._get_residual_threshold()
+        v = self._get_initial_values(model.n)
+        if self.initial_values is None:
+            policy = model.backup(model.rewards, self.gamma).argmax(axis=0)
+        else:
+            policy = model.backup(v, self.gamma).argmax(axis=0)
+        if self.gamma >= 1 and not model.is_proper(policy):
+            # the values of an improper policy are infinite without
+            # discounting, the following policies stay proper
+            policy = model.proper_policy()
+        while self.iterations < self.max_iterations:
+            new_v = model.evaluate(policy, self.gamma)
+            if new_v is None:
+                new_v = model.evaluation_sweeps(v, policy, self.gamma,
+                                                self.max_iterations,
+                                                threshold)
+            v = new_v
+
+            q = model.backup(v, self.gamma)
+            best = q.argmax(axis=0)
+            # keep the current action if it is as good as the best one so
+            # that ties do not make the policy oscillate
+            states = np.arange(model.n)
+            current_q = q[policy, states]
+            tolerance = 1e-12 * np.maximum(1, np.abs(current_q))
+            keep = current_q >= q[best, states] - tolerance
+            new_policy = np.where(keep, policy, best)
+
+            changed = int(np.count_nonzero(new_policy != policy))
+            self._record_iteration(float(np.abs(q.max(axis=0) - v).max()),
+                                   changed)
+            policy = new_policy
+            if changed == 0:
+                break
+
+        self.values = v
+        self.policy = np.array([a.value for a in model.actions])[policy]
+
+
+class ModifiedPolicyIterationSolver(ArraySolverBase):
+    """Modified policy iteration.
+
+    Each iteration performs a Bellman backup, takes the greedy policy and
+    then evaluates it only approximately by ``k`` sweeps of iterative policy
+    evaluation. The solve stops under the same condition as
+    :class:`ValueIterationSolver` does.
+
+    :ivar k: number of evaluation sweeps per iteration
+    """
+    def __init__(self, gamma: float=.99, p_correct: float=.8,
+                 epsilon: float=1e-3, max_iterations: int=10000, k: int=10):
+        super().__init__(gamma, p_correct, epsilon, max_iterations)
+        if k < 0:
+            raise ValueError('The number of evaluation sweeps must be '
+                             'non-negative.')
+        self.k = k
+
+    def _solve(self):
+        model = SparseModel(self.environment)
+        threshold = self._get_residual_threshold()
+        v = self._get_initial_values(model.n)
+        policy = None
+        while self.iterations < self.max_iterations:
+            q = model.backup(v, self.gamma)
+            new_policy = q.argmax(axis=0)
+            new_v = q.max(axis=0)
+            residual = float(np.abs(new_v - v).max())
+            changed = (None if policy is None else
+                       int(np.count_nonzero(new_policy != policy)))
+            v = new_v
+            policy = new_policy
+
+            self._record_iteration(residual, changed)
+            if residual < threshold:
+                break
+            v = model.evaluation_sweeps(v, policy, self.gamma, self.k)
+
+        self.values = v
+        self.policy = np.array([a.value for a in model.actions])[policy]
+
+
+class PrioritizedSweepingSolver(ArraySolverBase):
+    """Asynchronous value iteration with prioritized sweeping.
+
+    Instead of sweeping over all states, only the states whose values may
+    have changed enough, i.e. whose priority exceeds the residual threshold,
+    are backed up, in place. The priority of a state estimates its Bellman
+    residual: whenever the value of a state changes by ``d``, the priority
+    of each of its predecessors ``p`` is raised to at least
+    ``gamma * P(s | p) * |d|`` (the maximum over actions). The predecessors
+    are computed once from the transition matrices. Teleport states depend
+    on the mean of all values, a change of the mean raises their priority
+    the same way.
+
+    The pending states are visited in the order in which values propagate
+    from the exits, i.e. by their distance to the nearest exit (see
+    :meth:`SparseModel.distances_to_exits`). The states at the same distance
+    are backed up at once by vectorized operations, which gives the same
+    values as backing them up one by one since in a maze they never lead to
+    each other (the moves change the distance by exactly one). The backups
+    solve for the probability of staying in place, so a state next to a wall
+    does not need a backup for each time its value approaches the one of
+    the neighbours. Unless there are initial values, the values start with
+    a single pass in that order, which takes every move away from the exits
+    for staying in place.
+
+    When no priority exceeds the residual threshold, a full backup of all
+    states computes the actual residuals. The solve ends if none of them
+    exceeds the threshold (so that the values are within ``epsilon`` of the
+    optimal ones like with :class:`ValueIterationSolver`), otherwise the
+    residuals become the new priorities.
+
+    Since there are no synchronous sweeps, :attr:`iterations` counts the
+    sweep equivalents, i.e. the number of backups (including the full ones)
+    divided by the number of states (rounded up, but at most
+    :attr:`max_iterations`), and :attr:`residuals` holds the highest pending
+    priority after each of them.
+
+    :ivar backups: number of single-state backups performed by the last
+        solve
+    """
+    def __init__(self, gamma: float=.99, p_correct: float=.8,
+                 epsilon: float=1e-3, max_iterations: int=10000):
+        super().__init__(gamma, p_correct, epsilon, max_iterations)
+        self.backups = 0
+
+    def _solve(self):
+        model = SparseModel(self.environment)
+        threshold = self._get_residual_threshold()
+        gamma = self.gamma
+        n = model.n
+        m = model.dummy
+        teleports = np.flatnonzero(model.teleports)
+        distances = model.distances_to_exits(*model.transitions())
+        levels, level_of = self._get_levels(distances, m)
+        # the predecessors of each state in the rows of the padded layout
+        # (see csr_to_padded)
+        pred_probs, pred_states = (
+            np.ascontiguousarray(a.T) for a in csr_to_padded(
+                *self._get_predecessors(model)))
+        pred_probs *= gamma
+
+        v = self._get_initial_values(n)
+        self.backups = 0
+        max_backups = self.max_iterations * n
+        priority = np.zeros(n)
+        if self.initial_values is None:
+            first_pass = self._get_successors(model, distances)
+            for states in levels:
+                v[states] = self._backup(model, first_pass, states, v)
+                self._count_backups(len(states), priority)
+            del first_pass
+        successors = self._get_successors(model)
+
+        while self.backups < max_backups:
+            # a full backup gives the actual residuals
+            q = model.backup(v, gamma)
+            new_v = q.max(axis=0)
+            priority = np.abs(new_v - v)
+            self._count_backups(n, priority)
+            if not priority.max(initial=0) >= threshold:
+                # the backed up values are the ones within epsilon
+                v = new_v
+                break
+
+            waiting = np.zeros(len(levels), dtype='?')
+            waiting[level_of[priority >= threshold]] = True
+            level = 0
+            while self.backups < max_backups:
+                # the next level with pending states, starting over from
+                # the exits after the farthest one
+                level += int(waiting[level:].argmax())
+                if not waiting[level]:
+                    level = int(waiting.argmax())
+                    if not waiting[level]:
+                        break
+                waiting[level] = False
+                states = levels[level]
+                states = states[priority[states] >= threshold]
+                if not len(states):
+                    continue
+                priority[states] = 0
+
+                new_v = self._backup(model, successors, states, v)
+                delta = new_v - v[states]
+                v[states] = new_v
+                self._count_backups(len(states), priority)
+
+                # raise the priorities of the predecessors
+                raised = pred_probs[states] * np.abs(delta)[:, None]
+                predecessors = pred_states[states]
+                np.maximum.at(priority, predecessors, raised)
+                waiting[level_of[predecessors[raised >= threshold]]] = True
+                mean_change = gamma * abs(delta.sum()) / max(m, 1)
+                if len(teleports) and mean_change > 0:
+                    priority[teleports] = np.maximum(priority[teleports],
+                                                     mean_change)
+                    if mean_change >= threshold:
+                        waiting[level_of[teleports]] = True
+        else:
+            # out of backups, the policy is greedy on the current values
+            q = model.backup(v, gamma)
+
+        if self.backups % n != 0 and self.iterations < self.max_iterations:
+            self._record_iteration(float(priority.max(initial=0)))
+        self.values = v
+        self.policy = np.array([a.value for a in model.actions])[
+            q.argmax(axis=0)]
+
+    def _count_backups(self, count: int, priority: np.ndarray):
+        # records an iteration for each multiple of the number of states
+        # passed
+        n = len(priority)
+        for _ in range((self.backups + count) // n - self.backups // n):
+            self._record_iteration(float(priority.max(initial=0)))
+        self.backups += count
+
+    @staticmethod
+    def _get_levels(distances: np.ndarray, dummy: int) -> tuple:
+        """
+        :return: a tuple ``(levels, level_of)`` of the list of arrays of the
+            states at the same distance to the exits, the nearest first,
+            and of the index of the level of each state; the dummy state is
+            in none of the levels (its level is the last one, which is
+            empty)
+        """
+        states = np.argsort(distances, kind='stable')
+        states = states[states != dummy]
+        d = distances[states]
+        bounds = np.flatnonzero(d[1:] != d[:-1]) + 1
+        levels = np.split(states, bounds)
+        level_of = np.empty(len(distances), dtype=np.intp)
+        level_of[states] = np.repeat(np.arange(len(levels)),
+                                     [len(l) for l in levels])
+        level_of[dummy] = len(levels)
+        levels.append(np.array([], dtype=np.intp))
+        return levels, level_of
+
+    def _get_successors(self, model: SparseModel,
+                        distances: np.ndarray=None) -> tuple:
+        """
+        :param distances: the distances to the exits, if given, the moves
+            away from the exits are taken for staying in place
+        :return: a tuple ``(probs, states, rewards)`` of arrays with a row
+            for each state: the successors of the state for all actions in
+            the padded layout (see :func:`csr_to_padded`) one action after
+            another, and the reward for each action, both divided by the
+            probability of not staying in place (solving the backup for the
+            value of the state), the probabilities are multiplied by
+            ``gamma``
+        """
+        gamma = self.gamma
+        padded = [csr_to_padded(*matrix) for matrix in model.matrices]
+        k = max(len(probs) for probs, _ in padded)
+        probs = np.zeros((len(padded), k, model.n))
+        states = np.zeros((len(padded), k, model.n), dtype=np.intp)
+        for i, (p, s) in enumerate(padded):
+            probs[i, :len(p)] = p
+            states[i, :len(s)] = s
+        staying = states == np.arange(model.n)
+        if distances is not None:
+            staying |= distances[states] > distances
+        stay = (probs * staying).sum(axis=1)
+        # with gamma 1, staying with certainty can not be solved for
+        solvable = gamma * stay < 1
+        staying &= solvable[:, None, :]
+        scale = 1 / (1 - gamma * np.where(solvable, stay, 0))
+        probs[staying] = 0
+        probs *= gamma * scale[:, None, :]
+        return (np.ascontiguousarray(probs.transpose(2, 0, 1).reshape(
+                    model.n, -1)),
+                np.ascontiguousarray(states.transpose(2, 0, 1).reshape(
+                    model.n, -1)),
+                np.ascontiguousarray((model.rewards * scale).T))
+
+    def _backup(self, model: SparseModel, successors: tuple,
+                states: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        :param successors: the arrays returned by :meth:`_get_successors`
+        :return: the backed up values of the given states
+        """
+        probs, indices, rewards = successors
+        actions = len(model.actions)
+        q = (probs[states] * v[indices[states]]).reshape(
+            len(states), actions, probs.shape[1] // actions).sum(axis=2)
+        q += rewards[states]
+        new_v = q.max(axis=1, initial=-np.inf)
+        is_teleport = model.teleports[states]
+        if is_teleport.any():
+            new_v[is_teleport] = (model.rewards[states[is_teleport]] +
+                                  self.gamma * v[:model.dummy].mean())
+        return new_v
+
+    @staticmethod
+    def _get_predecessors(model: SparseModel) -> tuple:
+        """
+        :return: the predecessors (other than through teleports) of all
+            states in the CSR layout, as a tuple ``(probs, states, indptr)``
+            of arrays, where ``probs`` holds the maximum probability of
+            getting from the predecessor to the state over all actions;
+            the dummy state has no predecessors since its value never
+            changes, and no state is a predecessor of itself
+        """
+        data, cols, rows = model.transitions()
+        order = np.lexsort((-data, rows, cols))
+        rows = rows[order]
+        cols = cols[order]
+        data = data[order]
+        first = np.ones(len(rows), dtype='?')
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        first &= (cols != model.dummy) & (cols != rows)
+        rows = rows[first]
+        cols = cols[first]
+        data = data[first]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(
+            cols, minlength=model.n))))
+        return data, rows, indptr
+
+
+BUILTIN_SOLVERS = {
+    'value-iteration': ValueIterationSolver,
+    'policy-iteration': PolicyIterationSolver,
+    'modified-policy-iteration': ModifiedPolicyIterationSolver,
+    'prioritized-sweeping': PrioritizedSweepingSolver,
+}
+"""Solvers available in the solution viewer by their names."""
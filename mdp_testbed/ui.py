@@ -1,24 +1,45 @@
 import enum
+import itertools
+import math
+import multiprocessing
 import queue
-import threading
 import time
 import tkinter as tk
 import tkinter.filedialog as fd
 import tkinter.messagebox as mb
 import tkinter.ttk as ttk
-from importlib.machinery import SourceFileLoader
 
 import numpy as np
 
 import mdp_testbed
+import mdp_testbed.batch as batch
+import mdp_testbed.cache as cache
+import mdp_testbed.profiling as profiling
+import mdp_testbed.reference as reference
+import mdp_testbed.solvers as solvers
 from mdp_testbed.internal import Action, Maze
-from mdp_testbed.utils import prod, Container
+from mdp_testbed.utils import prod, runs, Container
 
 act_vector = {mdp_testbed.internal.Action.N: np.array([0, -1], dtype='l'),
               mdp_testbed.internal.Action.S: np.array([0, +1], dtype='l'),
               mdp_testbed.internal.Action.W: np.array([-1, 0], dtype='l'),
               mdp_testbed.internal.Action.E: np.array([+1, 0], dtype='l')}
 
+solve_errors = {'load': 'during loading the solver file',
+                'construct': 'during constructor call of your solver',
+                'solve': 'during solving the MDP using your solver',
+                'extract': 'during extracting the actions and values from '
+                           'your solver'}
+
+maze_filetypes = [('Maze', '*.zip *' + Maze.BINARY_EXTENSION),
+                  ('ZIP', '*.zip'),
+                  ('Binary maze', '*' + Maze.BINARY_EXTENSION)]
+solution_filetypes = [('Solution', '*' + reference.SOLUTION_EXTENSION)]
+
+# seconds the solve process gets to exit after being terminated before it is
+# killed
+solve_stop_timeout = 1.0
+
 
 def rgb2color(r, g, b):
     return '#{:02x}{:02x}{:02x}'.format(r, g, b)
@@ -37,10 +58,14 @@ def create_colormap(rm, gm, bm, n=256):
 
 
 def apply_colormap(cmap, x):
+    """
+    :param x: an index or an array of indices into the colormap
+    :return: the RGB colors (with 8-bit components) of the indices, as an
+        array of shape ``x.shape + (3,)``
+    """
     rgb = cmap[x, :]
     rgb256 = np.interp(rgb, [0, 1], [0, 255])
-    rgb256 = rgb256.astype('l')
-    return tuple(rgb256)
+    return rgb256.astype('B')
 
 
 class EditMode(enum.Enum):
@@ -160,7 +185,7 @@ class ResourceMazeEditor(tk.Frame):
 
         self.zoom_scale = tk.Scale(self.menu_panel, orient=tk.HORIZONTAL,
                                    label='Cell size (zoom)', command=self.zoom,
-                                   from_=20, to=100, variable=self.zoom_var)
+                                   from_=2, to=100, variable=self.zoom_var)
         self.zoom_scale.set(50)
         self.zoom_scale.grid(column=0, row=11, columnspan=22,
                              sticky=tk.W + tk.E)
@@ -218,7 +243,7 @@ class ResourceMazeEditor(tk.Frame):
             if not (self.maze.is_absorbing_goal(x, y) or
                     self.maze.is_teleport_state(x, y)):
                 self.maze.set_reward(x, y, val)
-        self.maze_view.repaint()
+        self.maze_view.update_rewards()
 
     # noinspection PyUnusedLocal
     def zoom(self, *args):
@@ -232,14 +257,14 @@ class ResourceMazeEditor(tk.Frame):
     # noinspection PyUnusedLocal
     def save_maze(self, *args):
         fn = fd.asksaveasfilename(defaultextension='.zip',
-                                  filetypes=[('ZIP', '*.zip')],
+                                  filetypes=maze_filetypes[1:],
                                   initialdir='./mazes')
         self.maze.save_to_file(fn)
 
     # noinspection PyUnusedLocal
     def _handle_load_maze(self, *args):
         fn = fd.askopenfilename(defaultextension='.zip',
-                                filetypes=[('ZIP', '*.zip')],
+                                filetypes=maze_filetypes,
                                 initialdir='./mazes')
         if len(fn) == 0:
             return
@@ -268,12 +293,24 @@ class SolutionViewer(tk.Frame):
         super().__init__(master, cnf, **kw)
 
         self.maze_cont = Container()
-        self.environment = None
         self.solver_filename = None
-        self.solver_class = None
-        self.solver = None
-        self.solved_queue = queue.Queue()
+        self.solver_builtin = None
+        # the process running the solves (see
+        # mdp_testbed.batch.serve_solves), kept between them so that it
+        # does not have to build the model of the maze again
+        self.solve_process = None
+        self.solve_requests = None
+        self.solve_messages = None
+        self.solving = False
+        self.solve_generation = 0
+        self.trace = []
         self.start_time = None
+        # parameters of the solve in progress and its result as a
+        # mdp_testbed.reference.Solution
+        self.solve_parameters = None
+        self.solution = None
+        # values of the previous solves to warm start the following ones
+        self.warm_starts = cache.WarmStarts()
 
         self.zoom_var = tk.IntVar(value=40)
         self.draw_actions_var = tk.BooleanVar(value=True)
@@ -285,6 +322,10 @@ class SolutionViewer(tk.Frame):
         self.draw_walls_var = tk.BooleanVar(value=True)
         self.gamma_var = tk.DoubleVar(value=.95)
         self.p_correct_var = tk.DoubleVar(value=.8)
+        self.builtin_solver_var = tk.StringVar(value='Built-in solver')
+        self.profile_var = tk.BooleanVar(value=False)
+        self.warm_start_var = tk.BooleanVar(value=False)
+        self.time_limit_var = tk.DoubleVar(value=0)
 
         self.grid(sticky=tk.N + tk.S + tk.E + tk.W)
 
@@ -361,33 +402,87 @@ class SolutionViewer(tk.Frame):
         self.load_solution_button.grid(column=0, row=9, columnspan=2,
                                        sticky=tk.W + tk.E)
 
+        self.builtin_solver_menu = tk.OptionMenu(
+            self.menu_panel, self.builtin_solver_var,
+            *sorted(solvers.BUILTIN_SOLVERS),
+            command=self.load_builtin_solver)
+        self.builtin_solver_menu.grid(column=0, row=10, columnspan=2,
+                                      sticky=tk.W + tk.E)
+
         self.reload_solution_button = tk.Button(
             self.menu_panel, text='Reload/rerun solution',
             command=self._handle_reload_solution, state=tk.DISABLED)
-        self.reload_solution_button.grid(column=0, row=10, columnspan=2,
+        self.reload_solution_button.grid(column=0, row=11, columnspan=2,
                                          sticky=tk.W + tk.E)
 
-        tk.Label(self.menu_panel, text='Gamma').grid(column=0, row=11)
+        tk.Label(self.menu_panel, text='Gamma').grid(column=0, row=12)
         self.gamma_scale = tk.Spinbox(self.menu_panel, from_=0, to=1,
                                       increment=.05, justify=tk.RIGHT, width=6,
                                       textvariable=self.gamma_var)
-        self.gamma_scale.grid(column=1, row=11, sticky=tk.W + tk.E)
+        self.gamma_scale.grid(column=1, row=12, sticky=tk.W + tk.E)
 
-        tk.Label(self.menu_panel, text='Pr correct').grid(column=0, row=12)
+        tk.Label(self.menu_panel, text='Pr correct').grid(column=0, row=13)
         self.p_correct_spin = tk.Spinbox(self.menu_panel, from_=0, to=1,
                                          increment=.05, justify=tk.RIGHT,
                                          width=6,
                                          textvariable=self.p_correct_var)
-        self.p_correct_spin.grid(column=1, row=12, sticky=tk.W + tk.E)
+        self.p_correct_spin.grid(column=1, row=13, sticky=tk.W + tk.E)
+
+        self.profile_cb = tk.Checkbutton(self.menu_panel,
+                                         text='profile queries',
+                                         variable=self.profile_var)
+        self.profile_cb.grid(column=0, row=14, columnspan=2, sticky=tk.W)
+
+        self.warm_start_cb = tk.Checkbutton(self.menu_panel,
+                                            text='warm start',
+                                            variable=self.warm_start_var)
+        self.warm_start_cb.grid(column=0, row=15, columnspan=2, sticky=tk.W)
+
+        tk.Label(self.menu_panel, text='Time limit (s)').grid(column=0, row=16)
+        self.time_limit_spin = tk.Spinbox(self.menu_panel, from_=0, to=3600,
+                                          increment=10, justify=tk.RIGHT,
+                                          width=6,
+                                          textvariable=self.time_limit_var)
+        self.time_limit_spin.grid(column=1, row=16, sticky=tk.W + tk.E)
+
+        self.cancel_button = tk.Button(
+            self.menu_panel, text='Cancel solving',
+            command=self._handle_cancel_solve, state=tk.DISABLED)
+        self.cancel_button.grid(column=0, row=17, columnspan=2,
+                                sticky=tk.W + tk.E)
 
         ttk.Separator(self.menu_panel, orient=tk.HORIZONTAL).grid(
-            column=0, row=13, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E,
+            column=0, row=18, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E,
             pady=3)
         self.zoom_scale = tk.Scale(self.menu_panel, orient=tk.HORIZONTAL,
                                    label='Cell size (zoom)', command=self.zoom,
-                                   from_=20, to=100, variable=self.zoom_var)
+                                   from_=2, to=100, variable=self.zoom_var)
         self.zoom_scale.set(50)
-        self.zoom_scale.grid(column=0, row=14, columnspan=2, sticky=tk.W + tk.E)
+        self.zoom_scale.grid(column=0, row=19, columnspan=2,
+                             sticky=tk.W + tk.E)
+
+        tk.Label(self.menu_panel, text='Convergence').grid(
+            column=0, row=20, columnspan=2, sticky=tk.W)
+        self.convergence_plot = ConvergencePlot(self.menu_panel)
+        self.convergence_plot.grid(column=0, row=21, columnspan=2)
+
+        self.save_trace_button = tk.Button(
+            self.menu_panel, text='Save trace',
+            command=self._handle_save_trace, state=tk.DISABLED)
+        self.save_trace_button.grid(column=0, row=22, columnspan=2,
+                                    sticky=tk.W + tk.E)
+
+        self.export_solution_button = tk.Button(
+            self.menu_panel, text='Export solution',
+            command=self._handle_export_solution, state=tk.DISABLED)
+        self.export_solution_button.grid(column=0, row=23, columnspan=2,
+                                         sticky=tk.W + tk.E)
+
+        self.compare_button = tk.Button(
+            self.menu_panel, text='Compare with reference',
+            command=self._handle_compare, state=tk.DISABLED)
+        self.compare_button.grid(column=0, row=24, columnspan=2,
+                                 sticky=tk.W + tk.E)
 
         # maze view panel
         self.maze_view = SolutionView(self, self.maze_cont,
@@ -418,7 +513,7 @@ class SolutionViewer(tk.Frame):
     # noinspection PyUnusedLocal
     def _handle_load_maze(self, *args):
         fn = fd.askopenfilename(defaultextension='.zip',
-                                filetypes=[('ZIP', '*.zip')],
+                                filetypes=maze_filetypes,
                                 initialdir='./mazes')
         if len(fn) == 0:
             return
@@ -426,11 +521,52 @@ class SolutionViewer(tk.Frame):
 
     def load_maze(self, fn):
         self.maze = Maze.load_from_file(fn)
-        self.environment = mdp_testbed.Environment(self.maze)
         self.maze_view.solved = False
         self.maze_view.repaint()
-        threading.Thread(target=self.solve).start()
-        self.after(100, self._wait_for_solve)
+        self._start_solve()
+
+    # noinspection PyUnusedLocal
+    def _handle_save_trace(self, *args):
+        fn = fd.asksaveasfilename(defaultextension='.csv',
+                                  filetypes=[('CSV', '*.csv')],
+                                  initialdir='.')
+        if len(fn) == 0:
+            return
+        profiling.write_trace(fn, self.trace)
+
+    # noinspection PyUnusedLocal
+    def _handle_export_solution(self, *args):
+        fn = fd.asksaveasfilename(
+            defaultextension=reference.SOLUTION_EXTENSION,
+            filetypes=solution_filetypes, initialdir='.')
+        if len(fn) == 0:
+            return
+        reference.save_solution(fn, self.solution)
+
+    # noinspection PyUnusedLocal
+    def _handle_compare(self, *args):
+        fn = fd.askopenfilename(
+            defaultextension=reference.SOLUTION_EXTENSION,
+            filetypes=solution_filetypes, initialdir='.')
+        if len(fn) == 0:
+            return
+        self.compare_with_reference(fn)
+
+    def compare_with_reference(self, fn):
+        """Compares the current solution with the reference solution in the
+        given file and shows the cells where their policies disagree.
+        """
+        try:
+            diff = reference.compare_solutions(
+                self.maze, self.solution, reference.load_solution(fn))
+        except (OSError, KeyError, ValueError) as e:
+            mb.showerror('Cannot compare solutions', str(e))
+            return
+        print('--- Comparison with {} ---'.format(fn))
+        print(reference.format_diff(diff))
+        self.status_bar.config(text='{} | {}'.format(
+            self._get_solver_description(), reference.format_diff(diff)))
+        self.maze_view.set_diff(diff.disagreements)
 
     # noinspection PyUnusedLocal
     def _handle_load_solution(self, *args):
@@ -443,103 +579,271 @@ class SolutionViewer(tk.Frame):
 
     # noinspection PyUnusedLocal
     def _handle_reload_solution(self, *args):
-        if self.solver_filename is not None:
+        if self.solver_builtin is not None:
+            self.load_builtin_solver(self.solver_builtin)
+        elif self.solver_filename is not None:
             self.load_solution(self.solver_filename)
 
+    def load_builtin_solver(self, name):
+        self.solver_filename = None
+        self.solver_builtin = name
+        self.status_bar.config(text=self._get_solver_description())
+        self.reload_solution_button.config(state=tk.NORMAL)
+        self.maze_view.solved = False
+        self.maze_view.update_solution()
+        self._start_solve()
+
     def load_solution(self, fn):
         self.solver_filename = fn
-        self.status_bar.config(text='Solution file: {}'.format(
-            self.solver_filename))
+        self.solver_builtin = None
+        self.status_bar.config(text=self._get_solver_description())
         self.reload_solution_button.config(state=tk.NORMAL)
-        try:
-            solution_module = SourceFileLoader('module', fn).load_module()
-        except Exception as e:
-            mb.showerror(e.__class__.__name__,
-                         '{}\n\nAn exception occurred during loading the '
-                         'solver file. Traceback will be written to the '
-                         'standard error output.'.format(str(e)))
-            raise
-        try:
-            self.solver_class = solution_module.Solver
-        except AttributeError:
-            mb.showerror('No Solver class',
-                         'There is no "Solver" class in your solution file.')
-            raise
-        except Exception as e:
-            mb.showerror(e.__class__.__name__,
-                         '{}\n\nAn exception occurred during searching for '
-                         'the "Solver" class in the solver file. Traceback '
-                         'will be written to the standard error '
-                         'output.'.format(str(e)))
-            raise
         self.maze_view.solved = False
-        self.maze_view.repaint()
-        threading.Thread(target=self.solve).start()
-        self.after(100, self._wait_for_solve)
-
-    # noinspection PyProtectedMember
-    def solve(self):
-        if self.solver_class is None or self.environment is None:
-            self.solved_queue.put(False)
+        self.maze_view.update_solution()
+        self._start_solve()
+
+    def _get_solver_description(self):
+        if self.solver_builtin is not None:
+            return 'Built-in solver: {}'.format(self.solver_builtin)
+        return 'Solution file: {}'.format(self.solver_filename)
+
+    def _start_solve(self):
+        """Starts solving the MDP of the current maze by the current solver
+        in the solve subprocess (see :func:`mdp_testbed.batch.serve_solves`),
+        cancelling the solve in progress, if any.
+        """
+        self.cancel_solve()
+        # results of the previous solves which are still to be polled for are
+        # discarded
+        self.solve_generation += 1
+        self.trace = []
+        self.convergence_plot.set_trace(self.trace)
+        self.save_trace_button.config(state=tk.DISABLED)
+        self.solution = None
+        self.export_solution_button.config(state=tk.DISABLED)
+        self.compare_button.config(state=tk.DISABLED)
+        self.maze_view.set_diff(None)
+        if self.maze is None:
+            return
+        if self.solver_builtin is not None:
+            solver = self.solver_builtin
+            print('--- Built-in solver: {} ---'.format(self.solver_builtin))
+        elif self.solver_filename is not None:
+            solver = self.solver_filename
+            print('--- Solver file: {} ---'.format(self.solver_filename))
+        else:
             return
-        print('--- Solver file: {} ---'.format(self.solver_filename))
-        print('--- Constructing solver ---')
-        try:
-            self.solver = self.solver_class(gamma=self.gamma_var.get(),
-                                            p_correct=self.p_correct_var.get())
-        except Exception as e:
-            mb.showerror(e.__class__.__name__,
-                         '{}\n\nAn exception occurred during constructor call '
-                         'of your solver. Traceback will be written to the '
-                         'standard error output.'.format(str(e)))
-            self.solved_queue.put(False)
-            raise
         print('--- Solving MDP ---')
+        self.solve_parameters = (self.gamma_var.get(),
+                                 self.p_correct_var.get())
+        initial_values = None
+        if self.warm_start_var.get():
+            previous = self.warm_starts.get(self._get_warm_start_key(),
+                                            *self.solve_parameters)
+            if previous is not None:
+                print('--- Warm start from gamma = {}, p_correct = {} '
+                      '---'.format(*previous[:2]))
+                initial_values = previous[2]
+        if self.solve_process is None or not self.solve_process.is_alive():
+            self._start_solve_process()
+        self.solve_requests.put((solver, self.maze, *self.solve_parameters,
+                                 self.profile_var.get(), initial_values))
+        self.solving = True
         self.start_time = time.time()
+        self.cancel_button.config(state=tk.NORMAL)
+        self.after(100, self._wait_for_solve, self.solve_generation)
+
+    def _start_solve_process(self):
+        # a fresh interpreter, forking a process running tkinter is unsafe
+        context = multiprocessing.get_context('spawn')
+        self.solve_requests = context.Queue()
+        self.solve_messages = context.Queue()
+        self.solve_process = context.Process(
+            target=batch.serve_solves,
+            args=(self.solve_requests, self.solve_messages), daemon=True)
+        self.solve_process.start()
+
+    def _stop_solve_process(self):
+        self.solve_process.terminate()
+        self.solve_process.join(solve_stop_timeout)
+        if self.solve_process.is_alive():
+            # the solution handles or ignores the termination signal
+            self.solve_process.kill()
+            self.solve_process.join()
+        self.solve_process = None
+        self.solve_requests = None
+        self.solve_messages = None
+
+    def _get_warm_start_key(self) -> tuple:
+        return (self.solver_builtin or self.solver_filename,
+                self.maze.get_key())
+
+    def cancel_solve(self):
+        """Kills the subprocess of the solve in progress, if any. The next
+        solve starts a new one.
+        """
+        if not self.solving:
+            return
+        self._stop_solve_process()
+        self.solving = False
+        self.cancel_button.config(state=tk.DISABLED)
+
+    # noinspection PyUnusedLocal
+    def _handle_cancel_solve(self, *args):
+        if not self.solving:
+            return
+        self.cancel_solve()
+        print('--- Solve cancelled ---')
+        self.status_bar.config(text='{} | cancelled'.format(
+            self._get_solver_description()))
+
+    def _receive_messages(self) -> tuple:
+        """Receives the messages from the solve subprocess.
+
+        :return: the final message (``'done'`` or ``'error'``) or ``None`` if
+            the solve is still running
+        """
         try:
-            self.solver.solve_mdp(self.environment)
-        except Exception as e:
-            mb.showerror(e.__class__.__name__,
-                         '{}\n\nAn exception occurred during solving the MDP '
-                         'using your solver. Traceback will be written to the '
-                         'standard error output.'.format(str(e)))
-            self.solved_queue.put(False)
-            raise
-        print('Time taken: {:.2f} s'.format(time.time() - self.start_time))
-        try:
-            self.maze_view.states_values_actions = {
-                s._get_coords(): (s,
-                                  self.solver.get_value_for_state(s),
-                                  self.solver.get_action_for_state(s))
-                for s in self.environment.get_all_states()
-                if not s._is_dummy()
-                }
-            vals = [v
-                    for s, v, _
-                    in self.maze_view.states_values_actions.values()
-                    if not s._is_dummy()]
-            self.maze_view.min_v = min(vals)
-            self.maze_view.max_v = max(vals)
-        except Exception as e:
-            mb.showerror(e.__class__.__name__,
-                         '{}\n\nAn exception occurred during extracting the '
-                         'actions and values from your solver. Traceback will '
-                         'be written to the standard error '
-                         'output.'.format(str(e)))
-            self.solved_queue.put(False)
-            raise
-        self.solved_queue.put(True)
-
-    def _wait_for_solve(self):
-        try:
-            solved = self.solved_queue.get_nowait()
-            self.maze_view.solved = solved
-            self.maze_view.repaint()
+            while True:
+                message = self.solve_messages.get_nowait()
+                if message[0] == 'progress':
+                    self.trace.append(message[1])
+                else:
+                    return message
         except queue.Empty:
-            self.after(100, self._wait_for_solve)
+            return None
+
+    def _wait_for_solve(self, generation):
+        if generation != self.solve_generation or not self.solving:
+            return
+        n = len(self.trace)
+        message = self._receive_messages()
+        if message is None and not self.solve_process.is_alive():
+            # the final message might have arrived after the queue was read
+            message = self._receive_messages()
+            if message is None:
+                message = ('error', 'died', None,
+                           self.solve_process.exitcode)
+        if len(self.trace) > n:
+            self.convergence_plot.set_trace(self.trace)
+            self.save_trace_button.config(state=tk.NORMAL)
+        if message is not None:
+            if not self.solve_process.is_alive():
+                self._stop_solve_process()
+            self.solving = False
+            self.cancel_button.config(state=tk.DISABLED)
+            self._finish_solve(message)
+            return
+
+        time_limit = self.time_limit_var.get()
+        if 0 < time_limit < time.time() - self.start_time:
+            self.cancel_solve()
+            print('--- Time limit of {} s exceeded ---'.format(time_limit))
+            self.status_bar.config(text='{} | time limit exceeded'.format(
+                self._get_solver_description()))
+            mb.showerror('Time limit exceeded',
+                         'Your solver did not finish within the time limit '
+                         'of {} s and it was stopped.'.format(time_limit))
+            return
+        self.after(100, self._wait_for_solve, generation)
+
+    # noinspection PyProtectedMember
+    def _finish_solve(self, message: tuple):
+        if message[0] == 'error':
+            _, phase, error_name, error = message
+            if phase == 'no-solver':
+                mb.showerror('No Solver class',
+                             'There is no "Solver" class in your solution '
+                             'file.')
+            elif phase == 'died':
+                mb.showerror('Solver process died',
+                             'The process running your solver ended '
+                             'unexpectedly (exit code {}), e.g. because it '
+                             'ran out of memory.'.format(error))
+            else:
+                mb.showerror(error_name,
+                             '{}\n\nAn exception occurred {}. Traceback will '
+                             'be written to the standard error '
+                             'output.'.format(error, solve_errors[phase]))
+            return
+
+        result = message[1]
+        print('Time taken: {:.2f} s'.format(result['runtime']))
+        if 'profile' in result:
+            for line in result['profile']:
+                print(line)
+            self.status_bar.config(text='{} | {}'.format(
+                self._get_solver_description(), result['profile_summary']))
+        self.solution = reference.Solution(result['values'],
+                                           result['actions'],
+                                           *self.solve_parameters)
+        self.export_solution_button.config(state=tk.NORMAL)
+        self.compare_button.config(state=tk.NORMAL)
+        self.warm_starts.put(self._get_warm_start_key(),
+                             *self.solve_parameters, result['values'])
+        self.maze_view.set_solution(result['values'], result['actions'])
+
+
+class ConvergencePlot(tk.Canvas):
+    """A plot of the residuals (in the log scale) over the iterations of a
+    solve, as reported by the solver.
+    """
+    def __init__(self, master, width=180, height=120, **kw):
+        super().__init__(master, width=width, height=height,
+                         bg=rgb2color(255, 255, 255), **kw)
+        self.plot_width = width
+        self.plot_height = height
+        self.padding = 5
+        self.line_color = (0, 0, 200)
+        self.text_color = (0, 0, 0)
+        self.trace = []
+
+    def set_trace(self, trace: list):
+        self.trace = trace
+        self.repaint()
+
+    def repaint(self):
+        self.delete(tk.ALL)
+        if len(self.trace) == 0:
+            return
+        last = self.trace[-1]
+        text = 'iteration {}, {:.2f} s'.format(last.iteration, last.elapsed)
+        if last.residual is not None:
+            text += '\nresidual {:.3g}'.format(last.residual)
+        if last.policy_changes is not None:
+            text += ', {} changes'.format(last.policy_changes)
+        self.create_text(self.plot_width - self.padding, self.padding,
+                         text=text, anchor=tk.NE, justify=tk.RIGHT,
+                         fill=rgb2color(*self.text_color))
+
+        points = [(p.iteration, math.log10(p.residual)) for p in self.trace
+                  if p.residual is not None and p.residual > 0]
+        # there is no point in drawing more points than there are pixels
+        step = max(1, len(points) // self.plot_width)
+        points = points[::step]
+        if len(points) < 2:
+            return
+        min_x = points[0][0]
+        max_x = max(points[-1][0], min_x + 1)
+        min_y = min(y for _, y in points)
+        max_y = max(max(y for _, y in points), min_y + 1)
+        w = self.plot_width - 2 * self.padding
+        h = self.plot_height - 2 * self.padding
+        coords = []
+        for x, y in points:
+            coords.append(self.padding + w * (x - min_x) / (max_x - min_x))
+            coords.append(self.padding + h * (max_y - y) / (max_y - min_y))
+        self.create_line(*coords, fill=rgb2color(*self.line_color))
 
 
 class MazeView(tk.Frame):
+    """A view of a maze on a scrollable canvas.
+
+    Only the cells in (and around) the visible part of the canvas are drawn,
+    the rest is drawn when it is scrolled into view. When the cells are
+    smaller than :attr:`lod_threshold` pixels, the view switches to a
+    reduced level of detail without the cell borders and text labels.
+    """
     def __init__(self, master, maze_cont, zoom_var, reward_var, edit_mode_var,
                  **kw):
         cnf = {}
@@ -553,6 +857,7 @@ class MazeView(tk.Frame):
         self.normal_color = (0, 0, 0)
         self.special_color = (80, 80, 140)
         self.special_padding = 0.15
+        self.lod_threshold = 20
 
         self.maze_cont = maze_cont
 
@@ -560,24 +865,31 @@ class MazeView(tk.Frame):
         self.reward_var = reward_var
         self.edit_mode_var = edit_mode_var
 
-        self.label_ids = set()
-        self.maze_grid_lines_ids = set()
-        self.maze_wall_lines_ids = set()
-        self.cell_ids = dict()
+        # the drawn cells, (x0, y0, x1, y1) with the upper bounds exclusive
+        self.region = (0, 0, 0, 0)
+        self._render_pending = False
+
+        # ids of the canvas items, kept so that single cells and walls can
+        # be updated without repainting the whole maze
+        self.cell_items = dict()
+        self.marker_items = dict()
+        self.reward_items = dict()
+        self.wall_items = dict()
 
         self._dragging = False
         self.canvas = tk.Canvas(self, bg=rgb2color(*self.normal_color))
         self.canvas.bind('<ButtonRelease-1>', func=self.handle_click)
         self.canvas.bind('<ButtonPress-1>', func=self.scroll_start)
         self.canvas.bind('<B1-Motion>', func=self.scroll_move)
+        self.canvas.bind('<Configure>', func=self._schedule_render)
         self.hscroll = tk.Scrollbar(self, orient=tk.HORIZONTAL)
         self.hscroll.pack(side=tk.BOTTOM, fill=tk.X)
         self.hscroll.config(command=self.canvas.xview)
         self.vscroll = tk.Scrollbar(self, orient=tk.VERTICAL)
         self.vscroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.vscroll.config(command=self.canvas.yview)
-        self.canvas.config(xscrollcommand=self.hscroll.set,
-                           yscrollcommand=self.vscroll.set)
+        self.canvas.config(xscrollcommand=self._handle_xscroll,
+                           yscrollcommand=self._handle_yscroll)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=tk.YES)
 
     @property
@@ -595,49 +907,43 @@ class MazeView(tk.Frame):
             return
         if self.maze is None:
             return
-        mx = self.canvas.canvasx(evt.x)
-        my = self.canvas.canvasy(evt.y)
+        w = self.maze.get_width()
+        h = self.maze.get_height()
+        fx = self.canvas.canvasx(evt.x) / self.node_length
+        fy = self.canvas.canvasy(evt.y) / self.node_length
+        if not (0 <= fx < w and 0 <= fy < h):
+            return
+        x = int(fx)
+        y = int(fy)
         edit_mode = EditMode(self.edit_mode_var.get())
         if edit_mode is EditMode.walls:
-            ids = self.canvas.find_overlapping(mx - self.node_length / 10,
-                                               my - self.node_length / 10,
-                                               mx + self.node_length / 10,
-                                               my + self.node_length / 10)
-            xys = [self.cell_ids[id_] for id_ in ids if id_ in self.cell_ids]
-            if len(xys) != 2:
+            # the click must be close to exactly one wall between two cells
+            vx = int(round(fx))
+            hy = int(round(fy))
+            near_vertical = abs(fx - vx) < .1 and 0 < vx < w
+            near_horizontal = abs(fy - hy) < .1 and 0 < hy < h
+            if near_vertical == near_horizontal:
                 return
-            xys.sort()
-            x1, y1 = xys[0]
-            x2, y2 = xys[1]
-            if x1 + 1 == x2:
-                assert y1 == y2
+            if near_vertical:
                 self.maze.set_vertical_wall(
-                    x2, y1, not self.maze.is_wall(x1, y1, Action.E))
-            elif y1 + 1 == y2:
-                assert x1 == x2
-                self.maze.set_horizontal_wall(
-                    x1, y2, not self.maze.is_wall(x1, y1, Action.S))
+                    vx, y, not self.maze.is_wall(vx - 1, y, Action.E))
+                self.update_wall(('v', vx, y))
             else:
-                raise ValueError('Invalid wall')
-            self.repaint()
-        else:
-            ids = self.canvas.find_overlapping(mx, my, mx, my)
-            xys = [self.cell_ids[id_] for id_ in ids if id_ in self.cell_ids]
-            if len(xys) != 1:
-                return
-            x, y = xys[0]
-            if edit_mode is EditMode.absorbing:
-                self.maze.set_absorbing_goal(
-                    x, y, not self.maze.is_absorbing_goal(x, y))
-                self.repaint()
-            elif edit_mode is EditMode.teleport:
-                self.maze.set_teleport_state(
-                    x, y, not self.maze.is_teleport_state(x, y))
-                self.repaint()
-            elif edit_mode is EditMode.reward:
-                val = float(self.reward_var.get())
-                self.maze.set_reward(x, y, val)
-                self.repaint()
+                self.maze.set_horizontal_wall(
+                    x, hy, not self.maze.is_wall(x, hy - 1, Action.S))
+                self.update_wall(('h', x, hy))
+        elif edit_mode is EditMode.absorbing:
+            self.maze.set_absorbing_goal(
+                x, y, not self.maze.is_absorbing_goal(x, y))
+            self.update_marker(x, y)
+        elif edit_mode is EditMode.teleport:
+            self.maze.set_teleport_state(
+                x, y, not self.maze.is_teleport_state(x, y))
+            self.update_marker(x, y)
+        elif edit_mode is EditMode.reward:
+            val = float(self.reward_var.get())
+            self.maze.set_reward(x, y, val)
+            self.update_reward(x, y)
 
     # noinspection PyUnresolvedReferences
     def scroll_start(self, evt: tk.Event):
@@ -648,27 +954,169 @@ class MazeView(tk.Frame):
         self._dragging = True
         self.canvas.scan_dragto(evt.x, evt.y, gain=1)
 
+    def _handle_xscroll(self, *args):
+        self.hscroll.set(*args)
+        self._schedule_render()
+
+    def _handle_yscroll(self, *args):
+        self.vscroll.set(*args)
+        self._schedule_render()
+
+    # noinspection PyUnusedLocal
+    def _schedule_render(self, *args):
+        # the view can change many times in a row (e.g. while dragging), it
+        # is rendered only once they are all processed
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render_visible)
+
+    def _render_visible(self):
+        """Repaints the view if a part of the maze which is not drawn became
+        visible.
+        """
+        self._render_pending = False
+        if self.maze is None:
+            return
+        x0, y0, x1, y1 = self._get_visible_cells()
+        rx0, ry0, rx1, ry1 = self.region
+        if not (rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1):
+            self.repaint()
+
+    def _get_visible_cells(self) -> tuple:
+        """
+        :return: the range ``(x0, y0, x1, y1)`` of the cells in the visible
+            part of the canvas, the upper bounds exclusive
+        """
+        w = self.maze.get_width()
+        h = self.maze.get_height()
+        # the canvas has no size until it is shown for the first time
+        width = max(self.canvas.winfo_width(), self.canvas.winfo_reqwidth())
+        height = max(self.canvas.winfo_height(),
+                     self.canvas.winfo_reqheight())
+        left = self.canvas.canvasx(0) / self.node_length
+        top = self.canvas.canvasy(0) / self.node_length
+        right = left + width / self.node_length
+        bottom = top + height / self.node_length
+        return (min(max(int(left), 0), w), min(max(int(top), 0), h),
+                min(max(int(right) + 1, 0), w),
+                min(max(int(bottom) + 1, 0), h))
+
+    def _get_render_region(self) -> tuple:
+        """
+        :return: the visible cells extended by a half of the visible size in
+            each direction, so that scrolling a bit does not need a repaint
+        """
+        x0, y0, x1, y1 = self._get_visible_cells()
+        mx = (x1 - x0) // 2 + 1
+        my = (y1 - y0) // 2 + 1
+        return (max(x0 - mx, 0), max(y0 - my, 0),
+                min(x1 + mx, self.maze.get_width()),
+                min(y1 + my, self.maze.get_height()))
+
+    def _get_region_cells(self):
+        x0, y0, x1, y1 = self.region
+        return itertools.product(range(x0, x1), range(y0, y1))
+
+    def _is_in_region(self, x, y):
+        x0, y0, x1, y1 = self.region
+        return x0 <= x < x1 and y0 <= y < y1
+
+    def is_lod(self) -> bool:
+        """
+        :return: whether the view is drawn with the reduced level of detail
+        """
+        return self.node_length < self.lod_threshold
+
     def clear(self):
         self.canvas.delete(tk.ALL)
+        self.region = (0, 0, 0, 0)
+        self.cell_items.clear()
+        self.marker_items.clear()
+        self.reward_items.clear()
+        self.wall_items.clear()
 
     def repaint(self):
-        self.canvas.delete(tk.ALL)
+        self.clear()
         if self.maze is None:
             return
         self.node_length = self.zoom_var.get()
+        border = self.wall_width / 2
+        self.canvas.config(scrollregion=(
+            -border - self.offset[0], -border - self.offset[1],
+            self.maze.get_width() * self.node_length + border + self.offset[0],
+            self.maze.get_height() * self.node_length + border +
+            self.offset[1]))
+        self.region = self._get_render_region()
         self._draw_maze()
         self._draw_actions()
         self._draw_rewards()
         self._draw_value_labels()
         self._draw_walls()
 
-        x1, y1, x2, y2 = self.canvas.bbox(tk.ALL)
-        self.canvas.config(scrollregion=(x1 - self.offset[0],
-                                         y1 - self.offset[1],
-                                         x2 + self.offset[0],
-                                         y2 + self.offset[1]))
+    def _restack(self):
+        """Restores the stacking order of the layers of canvas items after
+        some of them were redrawn.
+        """
+        for tag in ('heatmap', 'cell', 'marker', 'diff', 'arrow', 'reward',
+                    'value', 'wall'):
+            self.canvas.tag_raise(tag)
+
+    def update_wall(self, key):
+        """Redraws the walls on the grid line of the given wall segment to
+        match the maze.
+
+        :param key: ``('v', x, y)`` for the vertical segment from the corner
+            ``(x, y)`` down or ``('h', x, y)`` for the horizontal segment
+            from the corner ``(x, y)`` to the right
+        """
+        kind, x, y = key
+        x0, y0, x1, y1 = self.region
+        if kind == 'v':
+            line = ('v', x)
+            walls = self.maze.vertical_walls[y0:y1, x]
+            visible = x0 <= x <= x1
+        else:
+            line = ('h', y)
+            walls = self.maze.horizontal_walls[y, x0:x1]
+            visible = y0 <= y <= y1
+        for id_ in self.wall_items.pop(line, ()):
+            self.canvas.delete(id_)
+        if visible:
+            _, starts, ends = runs(walls[np.newaxis])
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                if kind == 'v':
+                    self._draw_wall(line, x, y0 + start, x, y0 + end)
+                else:
+                    self._draw_wall(line, x0 + start, y, x0 + end, y)
+
+    def update_marker(self, ix, iy):
+        """Redraws the goal/teleport marker of the given cell."""
+        id_ = self.marker_items.pop((ix, iy), None)
+        if id_ is not None:
+            self.canvas.delete(id_)
+        if not self._is_in_region(ix, iy):
+            return
+        id_ = self._draw_marker(ix, iy)
+        if id_ is None:
+            return
+        if (ix, iy) in self.cell_items:
+            self.canvas.tag_raise(id_, self.cell_items[(ix, iy)])
+        else:
+            self._restack()
+
+    def update_reward(self, ix, iy):
+        """Updates the reward label of the given cell."""
+        id_ = self.reward_items.get((ix, iy))
+        if id_ is not None:
+            self.canvas.itemconfig(id_, text='{:.2f}'.format(
+                self.maze.get_reward(ix, iy)))
 
-    def _draw_text(self, x: int, y: int, c, text: str, place, anchor):
+    def update_rewards(self):
+        for ix, iy in self.reward_items:
+            self.update_reward(ix, iy)
+
+    def _draw_text(self, x: int, y: int, c, text: str, place, anchor,
+                   tag=None):
         if place == tk.SW:
             dx, dy = 0, 1
             ex = self.wall_width / 2 + 2
@@ -686,96 +1134,123 @@ class MazeView(tk.Frame):
             ex = ey = 0
         else:
             raise ValueError('Unsupported text placement.')
-        id_ = self.canvas.create_text(
+        return self.canvas.create_text(
             (x + dx) * self.node_length + ex,
             (y + dy) * self.node_length + ey,
             text=text,
             fill=c,
-            anchor=anchor
+            anchor=anchor,
+            tags=tag
         )
-        self.label_ids.add(id_)
 
     def _draw_rewards(self):
-        for x, y in prod(self.maze.get_width(), self.maze.get_height()):
-            self._draw_text(x, y, rgb2color(*self.reward_label_color),
-                            '{:.2f}'.format(self.maze.get_reward(x, y)),
-                            tk.CENTER, tk.N)
+        if self.is_lod():
+            return
+        for x, y in self._get_region_cells():
+            self.reward_items[(x, y)] = self._draw_text(
+                x, y, rgb2color(*self.reward_label_color),
+                '{:.2f}'.format(self.maze.get_reward(x, y)), tk.CENTER, tk.N,
+                'reward')
 
     def _draw_maze(self):
-        self.cell_ids.clear()
-        for x, y in prod(self.maze.get_width(), self.maze.get_height()):
-            id_ = self._draw_cell(x, y)
-            self.cell_ids[id_] = (x, y)
+        self._draw_heatmap()
+        # the cell borders would be too dense to be useful
+        if not self.is_lod():
+            for x, y in self._get_region_cells():
+                self.cell_items[(x, y)] = self._draw_cell(x, y)
+        self._draw_markers()
+
+    def _draw_markers(self):
+        x0, y0, x1, y1 = self.region
+        special = (self.maze.absorbing_goal_states[y0:y1, x0:x1] |
+                   self.maze.teleport_states[y0:y1, x0:x1])
+        for y, x in zip(*np.nonzero(special)):
+            self._draw_marker(int(x) + x0, int(y) + y0)
 
     def _draw_cell(self, ix, iy):
         x = ix * self.node_length
         y = iy * self.node_length
-        pad = self.special_padding * (self.node_length + self.wall_width)
-        f = self.normal_color
-        id_ = self.canvas.create_rectangle(x, y,
-                                           x + self.node_length,
-                                           y + self.node_length,
-                                           width=1,
-                                           fill=rgb2color(*f),
-                                           outline=rgb2color(*self.wall_color))
-        if self.maze.is_absorbing_goal(ix, iy):
-            self.canvas.create_rectangle(
+        # the cells are transparent so that the heatmap under them is seen
+        return self.canvas.create_rectangle(
+            x, y, x + self.node_length, y + self.node_length, width=1,
+            fill='', outline=rgb2color(*self.wall_color), tags='cell')
+
+    def _is_goal_drawn(self, ix, iy):
+        return self.maze.is_absorbing_goal(ix, iy)
+
+    def _is_teleport_drawn(self, ix, iy):
+        return self.maze.is_teleport_state(ix, iy)
+
+    def _draw_marker(self, ix, iy):
+        x = ix * self.node_length
+        y = iy * self.node_length
+        pad = self.special_padding * (self.node_length +
+                                      self._get_wall_width())
+        if self._is_goal_drawn(ix, iy):
+            id_ = self.canvas.create_rectangle(
                 x + pad,
                 y + pad,
                 x + self.node_length - pad,
                 y + self.node_length - pad,
-                width=3,
+                width=min(3, self._get_wall_width()),
                 outline=rgb2color(*self.special_color),
-                fill=rgb2color(*self.special_color)
+                fill=rgb2color(*self.special_color),
+                tags='marker'
             )
-        elif self.maze.is_teleport_state(ix, iy):
-            self.canvas.create_rectangle(
+        elif self._is_teleport_drawn(ix, iy):
+            id_ = self.canvas.create_rectangle(
                 x + pad,
                 y + pad,
                 x + self.node_length - pad,
                 y + self.node_length - pad,
-                width=3,
-                outline=rgb2color(*self.special_color)
+                width=min(3, self._get_wall_width()),
+                outline=rgb2color(*self.special_color),
+                tags='marker'
             )
+        else:
+            return None
+        self.marker_items[(ix, iy)] = id_
         return id_
 
+    def _get_wall_width(self):
+        if self.is_lod():
+            return max(1, self.node_length // 4)
+        return self.wall_width
+
     def _draw_walls(self):
-        h = self.maze.get_height()
-        w = self.maze.get_width()
+        # consecutive wall segments on the same grid line are drawn as a
+        # single line
+        x0, y0, x1, y1 = self.region
+        xs, starts, ends = runs(self.maze.vertical_walls[y0:y1,
+                                                         x0:x1 + 1].T)
+        for x, start, end in zip(xs.tolist(), starts.tolist(),
+                                 ends.tolist()):
+            self._draw_wall(('v', x0 + x), x0 + x, y0 + start, x0 + x,
+                            y0 + end)
+        ys, starts, ends = runs(self.maze.horizontal_walls[y0:y1 + 1, x0:x1])
+        for y, start, end in zip(ys.tolist(), starts.tolist(),
+                                 ends.tolist()):
+            self._draw_wall(('h', y0 + y), x0 + start, y0 + y, x0 + end,
+                            y0 + y)
+
+    def _draw_wall(self, line, ax, ay, bx, by):
+        """Draws a wall between the given corners of the cells.
+
+        :param line: the grid line of the wall, ``('v', x)`` or ``('h', y)``
+        """
+        id_ = self.canvas.create_line(ax * self.node_length,
+                                      ay * self.node_length,
+                                      bx * self.node_length,
+                                      by * self.node_length,
+                                      width=self._get_wall_width(),
+                                      fill=rgb2color(*self.wall_color),
+                                      capstyle=tk.ROUND,
+                                      tags='wall')
+        self.wall_items.setdefault(line, []).append(id_)
+        return id_
 
-        walls = set()
-        for x, y in prod(w, h):
-            for action in mdp_testbed.internal.Action:
-                if self.maze.is_wall(x, y, action):
-                    walls.add((x, y, action))
-
-        for x, y, action in walls:
-            ax = x
-            bx = x
-            ay = y
-            by = y
-            if action is mdp_testbed.internal.Action.N:
-                bx += 1
-            elif action is mdp_testbed.internal.Action.S:
-                bx += 1
-                ay += 1
-                by += 1
-            elif action is mdp_testbed.internal.Action.W:
-                ay += 1
-            elif action is mdp_testbed.internal.Action.E:
-                ax += 1
-                bx += 1
-                by += 1
-            else:
-                raise ValueError('Invalid action')
-            id_ = self.canvas.create_line(ax * self.node_length,
-                                          ay * self.node_length,
-                                          bx * self.node_length,
-                                          by * self.node_length,
-                                          width=self.wall_width,
-                                          fill=rgb2color(*self.wall_color),
-                                          capstyle=tk.ROUND)
-            self.maze_wall_lines_ids.add(id_)
+    def _draw_heatmap(self):
+        pass
 
     def _draw_value_labels(self):
         pass
@@ -792,6 +1267,7 @@ class SolutionView(MazeView):
                          tk.IntVar(value=EditMode.normal.value), **kw)
 
         self.value_label_color = (0, 255, 0)
+        self.diff_color = (255, 0, 255)
 
         self.arrow_length_frac = 0.5
         self.arrow_start_offset = -0.5
@@ -822,97 +1298,188 @@ class SolutionView(MazeView):
         self.feather_rot_mat2 = np.array([[cs, sn],
                                           [-sn, cs]])
 
-        self.states_values_actions = None
         self.min_v = 0
         self.max_v = 0
         self.solved = False
+        # the solution as (height x width) grids, see set_solution
+        self.value_grid = None
+        self.action_grid = None
+
+        # mask of the cells whose action disagrees with a reference solution
+        self.diff_mask = None
+
+        self.arrow_items = dict()
+        self.value_items = dict()
+        self.diff_items = dict()
+        self.heatmap_image = None
 
         self.draw_actions_var = draw_actions_var
-        self.draw_actions_var.trace('w',
-                                    lambda *a: self.repaint())
+        self.draw_actions_var.trace(
+            'w', lambda *a: self._redraw_layer('arrow', self.arrow_items,
+                                               self._draw_actions))
         self.draw_value_labels_var = draw_value_labels_var
-        self.draw_value_labels_var.trace('w',
-                                         lambda *a: self.repaint())
+        self.draw_value_labels_var.trace(
+            'w', lambda *a: self._redraw_layer('value', self.value_items,
+                                               self._draw_value_labels))
         self.draw_value_colors_var = draw_value_colors_var
-        self.draw_value_colors_var.trace('w',
-                                         lambda *a: self.repaint())
+        self.draw_value_colors_var.trace(
+            'w', lambda *a: self._update_value_colors())
         self.draw_goals_var = draw_goals_var
-        self.draw_goals_var.trace('w',
-                                  lambda *a: self.repaint())
+        self.draw_goals_var.trace(
+            'w', lambda *a: self._redraw_layer('marker', self.marker_items,
+                                               self._draw_markers))
         self.draw_rewards_var = draw_rewards_var
-        self.draw_rewards_var.trace('w',
-                                    lambda *a: self.repaint())
+        self.draw_rewards_var.trace(
+            'w', lambda *a: self._redraw_layer('reward', self.reward_items,
+                                               self._draw_rewards))
         self.draw_teleports_var = draw_teleports_var
-        self.draw_teleports_var.trace('w',
-                                      lambda *a: self.repaint())
+        self.draw_teleports_var.trace(
+            'w', lambda *a: self._redraw_layer('marker', self.marker_items,
+                                               self._draw_markers))
         self.draw_walls_var = draw_walls_var
-        self.draw_walls_var.trace('w',
-                                  lambda *a: self.repaint())
+        self.draw_walls_var.trace(
+            'w', lambda *a: self._redraw_layer('wall', self.wall_items,
+                                               self._draw_walls))
+
+    def clear(self):
+        super().clear()
+        self.arrow_items.clear()
+        self.value_items.clear()
+        self.diff_items.clear()
+        self.heatmap_image = None
+
+    def _redraw_layer(self, tag, items, draw):
+        """Deletes the canvas items of a single layer and draws it again
+        (if it is enabled).
+        """
+        self.canvas.delete(tag)
+        items.clear()
+        if self.maze is None:
+            return
+        draw()
+        self._restack()
+
+    def set_solution(self, values: np.ndarray, actions: np.ndarray):
+        """Shows the given solution of the maze.
+
+        :param values: the values of the cells as a (height x width) grid
+        :param actions: the actions of the cells (as :class:`Action` values)
+            as a (height x width) grid
+        """
+        self.value_grid = values
+        self.action_grid = actions
+        self.min_v = values.min()
+        self.max_v = values.max()
+        self.solved = True
+        self.update_solution()
+
+    def set_diff(self, mask: np.ndarray):
+        """Highlights the cells where the policy disagrees with a reference
+        solution.
+
+        :param mask: the mask of the cells as a (height x width) grid or
+            ``None`` to remove the highlighting
+        """
+        self.diff_mask = mask
+        self._redraw_layer('diff', self.diff_items, self._draw_diff)
+
+    def update_solution(self):
+        """Redraws the parts of the view showing the solution (colors of the
+        cells, actions and values) after it changed.
+        """
+        self._update_value_colors()
+        self._redraw_layer('arrow', self.arrow_items, self._draw_actions)
+        self._redraw_layer('value', self.value_items, self._draw_value_labels)
+
+    def _update_value_colors(self):
+        self.canvas.delete('heatmap')
+        if self.maze is not None:
+            self._draw_heatmap()
+            self._restack()
+
+    def _get_value_colors(self, values: np.ndarray) -> np.ndarray:
+        """
+        :return: the colors of the given values as an array of RGB triples
+            (of 8-bit integers), the negative values are mapped through
+            :attr:`value_cmap_neg` and the positive ones through
+            :attr:`value_cmap_pos`
+        """
+        neg = np.interp(values, [self.min_v, 0], [0, 255]).astype('l')
+        pos = np.interp(values, [0, self.max_v], [0, 255]).astype('l')
+        return np.where((values < 0)[..., np.newaxis],
+                        apply_colormap(self.value_cmap_neg, neg),
+                        apply_colormap(self.value_cmap_pos, pos))
+
+    def _draw_heatmap(self):
+        """Draws the colors of the values of the cells as a single image
+        under the cell borders and walls. The image is built with a pixel per
+        cell and scaled up by Tk, so its cost does not depend on the zoom.
+        """
+        if not self.solved or not self.draw_value_colors_var.get():
+            return
+        x0, y0, x1, y1 = self.region
+        if x0 == x1 or y0 == y1:
+            return
+        rgb = self._get_value_colors(self.value_grid[y0:y1, x0:x1])
+        h, w = rgb.shape[:2]
+        ppm = 'P6 {} {} 255 '.format(w, h).encode('ascii') + rgb.tobytes()
+        self.heatmap_image = tk.PhotoImage(master=self.canvas, width=w,
+                                           height=h, data=ppm, format='PPM')
+        if self.node_length > 1:
+            self.heatmap_image = self.heatmap_image.zoom(self.node_length)
+        self.canvas.create_image(x0 * self.node_length,
+                                 y0 * self.node_length, anchor=tk.NW,
+                                 image=self.heatmap_image, tags='heatmap')
+
+    def _draw_maze(self):
+        super()._draw_maze()
+        self._draw_diff()
+
+    def _draw_diff(self):
+        if self.diff_mask is None or not self.solved:
+            return
+        x0, y0, x1, y1 = self.region
+        color = rgb2color(*self.diff_color)
+        # the outline alone would not be visible in small cells
+        fill = color if self.is_lod() else ''
+        for iy, ix in zip(*np.nonzero(self.diff_mask[y0:y1, x0:x1])):
+            ix = int(ix) + x0
+            iy = int(iy) + y0
+            x = ix * self.node_length
+            y = iy * self.node_length
+            self.diff_items[(ix, iy)] = self.canvas.create_rectangle(
+                x, y, x + self.node_length, y + self.node_length, width=2,
+                fill=fill, outline=color, tags='diff')
 
     def _draw_actions(self):
-        if not self.draw_actions_var.get() or not self.solved:
+        if (not self.draw_actions_var.get() or not self.solved or
+                self.is_lod()):
             return
-        for (x, y), (_, _, a) in self.states_values_actions.items():
-            self._draw_arrow(x, y, a)
+        for x, y in self._get_region_cells():
+            self.arrow_items[(x, y)] = self._draw_arrow(
+                x, y, Action(self.action_grid[y, x]))
 
     def _draw_rewards(self):
         if self.draw_rewards_var.get():
             super()._draw_rewards()
 
     def _draw_value_labels(self):
-        if not self.draw_value_labels_var.get() or not self.solved:
+        if (not self.draw_value_labels_var.get() or not self.solved or
+                self.is_lod()):
             return
-        for (x, y), (s, v, _) in self.states_values_actions.items():
-            self._draw_text(x, y, rgb2color(*self.value_label_color),
-                            '{:.2f}'.format(v), tk.CENTER, tk.S)
+        for x, y in self._get_region_cells():
+            self.value_items[(x, y)] = self._draw_text(
+                x, y, rgb2color(*self.value_label_color),
+                '{:.2f}'.format(self.value_grid[y, x]),
+                tk.CENTER, tk.S, 'value')
 
-    def _draw_cell(self, ix, iy):
-        x = ix * self.node_length
-        y = iy * self.node_length
-        pad = self.special_padding * (self.node_length + self.wall_width)
-        is_teleport = self.maze.is_teleport_state(ix, iy)
-        is_goal = self.maze.is_absorbing_goal(ix, iy)
-        f = self.normal_color
-        if self.draw_value_colors_var.get() and self.solved:
-            _, value, _ = self.states_values_actions[(ix, iy)]
-            if value < 0:
-                norm_val = int(np.interp(value,
-                                         [self.min_v, 0],
-                                         [0, 255]))
-                value_color = apply_colormap(self.value_cmap_neg, norm_val)
-            else:
-                norm_val = int(np.interp(value,
-                                         [0, self.max_v],
-                                         [0, 255]))
-                value_color = apply_colormap(self.value_cmap_pos, norm_val)
-            f = value_color
-        id_ = self.canvas.create_rectangle(x, y,
-                                           x + self.node_length,
-                                           y + self.node_length,
-                                           width=1, fill=rgb2color(*f),
-                                           outline=rgb2color(*self.wall_color))
-
-        if is_goal and self.draw_goals_var.get():
-            self.canvas.create_rectangle(
-                x + pad,
-                y + pad,
-                x + self.node_length - pad,
-                y + self.node_length - pad,
-                width=3,
-                fill=rgb2color(*self.special_color),
-                outline=rgb2color(*self.special_color)
-            )
-        elif is_teleport and self.draw_teleports_var.get():
-            self.canvas.create_rectangle(
-                x + pad,
-                y + pad,
-                x + self.node_length - pad,
-                y + self.node_length - pad,
-                width=3,
-                outline=rgb2color(*self.special_color)
-            )
+    def _is_goal_drawn(self, ix, iy):
+        return (self.draw_goals_var.get() and
+                self.maze.is_absorbing_goal(ix, iy))
 
-        return id_
+    def _is_teleport_drawn(self, ix, iy):
+        return (self.draw_teleports_var.get() and
+                self.maze.is_teleport_state(ix, iy))
 
     def _draw_walls(self):
         if self.draw_walls_var.get():
@@ -926,18 +1493,21 @@ class SolutionView(MazeView):
         start = c - v * l * self.arrow_start_offset
         end = start + v * l
 
-        self.canvas.create_line(start[0], start[1], end[0], end[1],
-                                width=self.arrow_width,
-                                fill=self.arrow_color,
-                                capstyle=tk.ROUND)
+        id1 = self.canvas.create_line(start[0], start[1], end[0], end[1],
+                                      width=self.arrow_width,
+                                      fill=self.arrow_color,
+                                      capstyle=tk.ROUND,
+                                      tags='arrow')
         f_v1 = self.feather_rot_mat1.dot(-v)
         f_v2 = self.feather_rot_mat2.dot(-v)
         f_e1 = end + f_v1 * self.arrow_feather_length_frac * l
         f_e2 = end + f_v2 * self.arrow_feather_length_frac * l
-        self.canvas.create_line(f_e1[0], f_e1[1],
-                                end[0], end[1],
-                                f_e2[0], f_e2[1],
-                                width=self.arrow_width,
-                                fill=self.arrow_color,
-                                capstyle=tk.ROUND,
-                                joinstyle=tk.MITER)
+        id2 = self.canvas.create_line(f_e1[0], f_e1[1],
+                                      end[0], end[1],
+                                      f_e2[0], f_e2[1],
+                                      width=self.arrow_width,
+                                      fill=self.arrow_color,
+                                      capstyle=tk.ROUND,
+                                      joinstyle=tk.MITER,
+                                      tags='arrow')
+        return id1, id2
@@ -1,5 +1,7 @@
 import itertools
 
+import numpy as np
+
 
 def prod(a: int, b: int):
     return itertools.product(range(a), range(b))
@@ -16,3 +18,55 @@ class Container(object):
     @val.setter
     def val(self, contents):
         self._contents = contents
+
+
+def csr_rows(indptr):
+    """
+    :return: the row index of each entry of a CSR matrix with the given row
+        pointers
+    """
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def csr_to_padded(data, indices, indptr, fill_index: int=0) -> tuple:
+    """Converts a CSR matrix to the padded layout: the ``k``-th row of the
+    padded arrays holds the ``k``-th entries of all rows of the matrix, there
+    are as many rows as entries in the longest row of the matrix. Shorter
+    rows are padded with zeros in the ``fill_index`` column.
+
+    :return: a tuple ``(data, indices)`` of the padded arrays
+    """
+    counts = np.diff(indptr)
+    n = len(counts)
+    k = int(counts.max(initial=0))
+    rows = np.repeat(np.arange(n), counts)
+    positions = np.arange(len(indices)) - np.repeat(indptr[:-1], counts)
+    padded_data = np.zeros((k, n))
+    padded_indices = np.full((k, n), fill_index,
+                             dtype=np.asarray(indices).dtype)
+    padded_data[positions, rows] = data
+    padded_indices[positions, rows] = indices
+    return padded_data, padded_indices
+
+
+def csr_dot(data, indices, rows, v, n: int):
+    """Multiplies a vector by a CSR matrix given by its data, column indices
+    and row indices of the entries (see :func:`csr_rows`).
+
+    :param n: the number of rows of the matrix
+    """
+    return np.bincount(rows, weights=data * v[indices], minlength=n)
+
+
+def runs(mask: np.ndarray) -> tuple:
+    """Finds the maximal runs of ``True`` in the rows of a 2D boolean array.
+
+    :return: a tuple ``(rows, starts, ends)`` of arrays, the ``i``-th run
+        being ``mask[rows[i], starts[i]:ends[i]]``
+    """
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype='b')
+    padded[:, 1:-1] = mask
+    d = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return rows, starts, ends
@@ -0,0 +1,77 @@
+import queue
+import signal
+
+import pytest
+
+import mdp_testbed.batch as batch
+from mdp_testbed.batch import (ThrottledProgress, compare_result, run_batch,
+                               run_solver, split_jobs)
+from mdp_testbed.generator import generate_maze
+from mdp_testbed.reference import Solution
+from mdp_testbed.solvers import PolicyIterationSolver, ValueIterationSolver
+
+
+def test_split_jobs_warm_start_groups_same_mazes():
+    jobs = list(enumerate([(s, m, g, .8) for s in ('a', 'b')
+                           for m in ('x.zip', 'y.zip', 'x_copy.zip')
+                           for g in (.9, .99)]))
+    tasks = split_jobs(jobs, 8, {'x.zip': 'k1', 'y.zip': 'k2',
+                                 'x_copy.zip': 'k1'})
+    assert [[i for i, _ in task] for task in tasks] == [
+        [0, 1, 4, 5], [2, 3], [6, 7, 10, 11], [8, 9]]
+    assert len(split_jobs(jobs, 8)) == 12
+
+
+def test_compare_result():
+    maze = generate_maze('rooms', 12, 9, goals=1, teleports=1, seed=0)
+    solution = run_solver(PolicyIterationSolver, maze, .95, .8)
+    expected = Solution(solution['values'], solution['actions'], .95, .8)
+    result = dict(run_solver(ValueIterationSolver, maze, .95, .8),
+                  gamma=.95, p_correct=.8, solver='vi', maze='m.zip')
+    compare_result(result, maze, expected)
+    assert result['matches_reference']
+    assert result['policy_disagreements'] == 0
+    result['values'][0, 0] += 1
+    compare_result(result, maze, expected)
+    assert not result['matches_reference']
+    assert result['max_error'] > 1 - 1e-3
+    compare_result(result, generate_maze('open', 5, 5, seed=0), expected)
+    assert not result['matches_reference']
+
+
+def test_throttled_progress_keeps_latest():
+    messages = queue.Queue()
+    progress = ThrottledProgress(messages, interval=60)
+    for i in range(1, 1001):
+        progress(i)
+    progress.flush()
+    progress.flush()
+    assert [messages.get_nowait() for _ in range(messages.qsize())] == [
+        ('progress', 1), ('progress', 1000)]
+
+
+STUCK_SOLUTION = """
+import signal
+
+from mdp_testbed import SolverBase
+
+
+class Solver(SolverBase):
+    def solve_mdp(self, environment):
+        # as if stuck in C code, the alarm of the time limit never goes off
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        while True:
+            pass
+"""
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGALRM'), reason='no SIGALRM')
+def test_stuck_worker_is_killed(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, 'KILL_GRACE_PERIOD', .5)
+    solution = tmp_path / 'stuck.py'
+    solution.write_text(STUCK_SOLUTION)
+    maze = str(tmp_path / 'maze.zip')
+    generate_maze('open', 5, 5, goals=1, seed=0).save_to_file(maze)
+    results = run_batch([str(solution), 'value-iteration'], [maze], [.9],
+                        [.8], workers=2, timeout=.5)
+    assert [r['status'] for r in results] == ['timeout', 'ok']
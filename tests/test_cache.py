@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from mdp_testbed.cache import ModelCache
+
+
+def build():
+    return {'a': np.arange(3), 'b': np.ones(2)}
+
+
+@pytest.mark.parametrize('contents', [b'', b'PK\x03\x04 truncated',
+                                      b'not a zip file'])
+def test_damaged_file_is_rebuilt(tmp_path, contents):
+    (tmp_path / 'key.npz').write_bytes(contents)
+    arrays = ModelCache(directory=str(tmp_path)).get_arrays('key', build)
+    assert (arrays['a'] == np.arange(3)).all()
+    cached = ModelCache(directory=str(tmp_path)).get_arrays('key', None)
+    assert sorted(cached) == ['a', 'b']
+
+
+def test_file_missing_array_is_rebuilt(tmp_path):
+    np.savez(str(tmp_path / 'key.npz'), a=np.zeros(3))
+    arrays = ModelCache(directory=str(tmp_path)).get_arrays(
+        'key', build, ['a', 'b'])
+    assert (arrays['a'] == np.arange(3)).all()
+    assert (arrays['b'] == np.ones(2)).all()
@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+
+from mdp_testbed import Environment
+from mdp_testbed.cache import model_cache
+from mdp_testbed.generator import generate_maze
+from mdp_testbed.internal import Maze
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.bool_])
+def test_read_grid_trailing_blank_line(dtype):
+    grid = Maze._read_grid(io.BytesIO(b'1 0 1\n0 1 1\n\n'), dtype)
+    assert grid.shape == (2, 3)
+    assert (grid == np.array([[1, 0, 1], [0, 1, 1]], dtype=dtype)).all()
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.bool_])
+def test_read_grid_ragged(dtype):
+    with pytest.raises(ValueError):
+        Maze._read_grid(io.BytesIO(b'1 0 1\n0\n1 1\n'), dtype)
+
+
+def test_zip_round_trip(tmp_path):
+    maze = Maze(5, 3, -1)
+    maze.maze_rewards[1, 2] = 2.5
+    maze.absorbing_goal_states[0, 4] = True
+    maze.vertical_walls[2, 1] = True
+    filename = str(tmp_path / 'maze.zip')
+    maze.save_to_file(filename)
+    loaded = Maze.load_from_file(filename)
+    for a, b in ((maze.maze_rewards, loaded.maze_rewards),
+                 (maze.absorbing_goal_states, loaded.absorbing_goal_states),
+                 (maze.teleport_states, loaded.teleport_states),
+                 (maze.vertical_walls, loaded.vertical_walls),
+                 (maze.horizontal_walls, loaded.horizontal_walls)):
+        assert a.shape == b.shape and (a == b).all()
+
+
+def test_transition_matrices_teleports():
+    environment = Environment(generate_maze('open', 20, 15, goals=2,
+                                            teleports=4, seed=3))
+    teleports = environment.get_teleport_mask()
+    v = np.random.RandomState(0).rand(len(teleports))
+    for action, (data, indices, indptr) in \
+            environment.get_transition_matrices().items():
+        assert (indptr[1:][teleports] == indptr[:-1][teleports]).all()
+        q = np.add.reduceat(np.append(data * v[indices], 0), indptr[:-1])
+        q[np.diff(indptr) == 0] = 0
+        q[teleports] = v[:-1].mean()
+        full = environment.get_transition_matrices(True)[action]
+        expected = np.add.reduceat(full[0] * v[full[1]], full[2][:-1])
+        assert np.allclose(q, expected)
+
+
+def test_transitions_cached_once_per_probability(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_cache, 'directory', str(tmp_path))
+    maze = generate_maze('open', 6, 5, goals=1, seed=4)
+    for p_correct in (.8, np.float64(.8)):
+        environment = Environment(maze)
+        environment.set_probability_of_correct_transition(p_correct)
+        environment.get_transition_matrices()
+    assert len(list(tmp_path.glob('*.npz'))) == 1
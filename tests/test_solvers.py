@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from mdp_testbed import Environment
+from mdp_testbed.generator import generate_maze
+from mdp_testbed.solvers import (PolicyIterationSolver,
+                                 PrioritizedSweepingSolver,
+                                 ValueIterationSolver)
+
+
+def solve(solver, maze):
+    solver.solve_mdp(Environment(maze))
+    return solver
+
+
+def settled_maze(size: int):
+    # a corridor along the top row leading to a goal, below it closed rooms
+    # without rewards whose values are settled from the start
+    maze = generate_maze('rooms', size, size, goals=0, reward=0, seed=1,
+                         room_size=5)
+    maze.horizontal_walls[1, :] = True
+    maze.maze_rewards[0, :] = -1
+    maze.absorbing_goal_states[0, -1] = True
+    maze.maze_rewards[0, -1] = 100
+    return maze
+
+
+def test_prioritized_sweeping_saves_backups():
+    maze = settled_maze(40)
+    vi = solve(ValueIterationSolver(.99, .8), maze)
+    ps = solve(PrioritizedSweepingSolver(.99, .8), maze)
+    assert ps.backups * 10 < vi.iterations * maze.maze_rewards.size
+
+
+def test_prioritized_sweeping_tolerance():
+    maze = generate_maze('open', 30, 30, goals=2, teleports=1, seed=7)
+    for epsilon in (1e-3, 1e-6):
+        pi = solve(PolicyIterationSolver(.99, .8), maze)
+        ps = solve(PrioritizedSweepingSolver(.99, .8, epsilon=epsilon),
+                   maze)
+        assert np.abs(ps.values - pi.values).max() <= epsilon
+
+
+@pytest.mark.parametrize('kind', ['perfect', 'rooms'])
+def test_prioritized_sweeping_generated_mazes(kind):
+    maze = generate_maze(kind, 40, 40, goals=1, seed=1)
+    vi = solve(ValueIterationSolver(.99, .8), maze)
+    ps = solve(PrioritizedSweepingSolver(.99, .8), maze)
+    # both are within epsilon of the optimal values
+    assert np.abs(ps.values - vi.values).max() <= 2e-3
+    assert ps.backups * 4 < vi.iterations * maze.maze_rewards.size
+
+
+def test_prioritized_sweeping_max_iterations():
+    maze = generate_maze('rooms', 30, 20, goals=2, teleports=2, seed=2)
+    for max_iterations in (1, 2, 5):
+        ps = solve(PrioritizedSweepingSolver(
+            .99, .8, max_iterations=max_iterations), maze)
+        assert ps.iterations == len(ps.residuals) == max_iterations